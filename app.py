@@ -1,15 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, font
 import threading
-import requests
-from valorip import login, live_match, constants, valapi
-from PIL import Image, ImageTk, ImageDraw, ImageFont
-from io import BytesIO
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from valorip import live_match, constants, valapi, content, events, stats, media, atlas, pipeline, metrics, replay
+from valorip.imagecache import ImageCache, image_key, image_cost
+from valorip.client import riot
+from valorip.scheduler import RefreshScheduler
+from PIL import Image, ImageTk, ImageFont
+from concurrent.futures import ThreadPoolExecutor
 import math
 
-requests.packages.urllib3.disable_warnings()
-
 REGION_MAP = {
     "eu": "euw",
     "na": "na",
@@ -21,90 +20,91 @@ REGION_MAP = {
 }
 
 def get_real_region():
-    reg = getattr(constants, "REGION", None)
-    if not reg or reg == "none":
-        reg = getattr(constants, "SHARD", None)
-    if not reg or reg == "none":
-        reg = "eu"
-    return reg.lower()
+    return riot.region
 
 def get_shared_host():
     reg = get_real_region()
     return REGION_MAP.get(reg, reg)
 
-# Cache for images
-image_cache = {}
+# Rendered images, keyed by URL + size + transform, bounded in memory
+image_cache = ImageCache()
 
-def load_image_from_url(url, max_size=None, circle=False):
-    """Download and resize image maintaining aspect ratio"""
-    if url in image_cache:
-        return image_cache[url]
-    
-    try:
-        response = requests.get(url, timeout=10)
-        img = Image.open(BytesIO(response.content))
-        
-        if circle:
-            # Create circular mask
-            size = min(img.size)
-            mask = Image.new('L', (size, size), 0)
-            draw = ImageDraw.Draw(mask)
-            draw.ellipse((0, 0, size, size), fill=255)
-            
-            # Crop to square and apply mask
-            img = img.crop(((img.width - size) // 2, (img.height - size) // 2,
-                           (img.width + size) // 2, (img.height + size) // 2))
-            
-            output = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-            output.paste(img, (0, 0))
-            output.putalpha(mask)
-            img = output
-        
-        if max_size:
-            img_width, img_height = img.size
-            max_width, max_height = max_size
-            
-            width_ratio = max_width / img_width
-            height_ratio = max_height / img_height
-            scale_factor = min(width_ratio, height_ratio)
-            
-            new_width = int(img_width * scale_factor)
-            new_height = int(img_height * scale_factor)
-            
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        photo = ImageTk.PhotoImage(img)
-        image_cache[url] = photo
-        return photo
-    except Exception as e:
-        print(f"Error loading image: {e}")
-        return None
+# Decode/resize runs on this long-lived pool; PhotoImages are only ever
+# created on the Tk thread, a few per event-loop turn
+IMAGE_WORKERS = 4
+PHOTO_BATCH = 6
+decode_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="decode")
 
-def load_all_images_parallel(items):
-    """Load all images in parallel"""
+def load_images(items, on_ready):
+    """Load images off the Tk thread, then call on_ready(images) on the Tk thread
+    
+    items are {'id', 'image_url', 'max_size', 'circle'} or {'id', 'atlas'}.
+    Callable from any thread.
+    """
     images = {}
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_item = {}
-        for item in items:
-            if item.get('image_url'):
-                future = executor.submit(
-                    load_image_from_url, 
-                    item['image_url'], 
-                    item.get('max_size'),
-                    item.get('circle', False)
-                )
-                future_to_item[future] = item['id']
-        
-        for future in as_completed(future_to_item):
-            item_id = future_to_item[future]
-            try:
-                img = future.result()
-                if img:
-                    images[item_id] = img
-            except Exception as e:
-                print(f"Error loading {item_id}: {e}")
+    atlas_keys = {}
+    decoded = []
+    jobs = []
+    for item in items:
+        if item.get('atlas'):
+            atlas_keys[item['id']] = item['atlas']
+            continue
+        if not item.get('image_url'):
+            continue
+        key = image_key(item['image_url'], item.get('max_size'), item.get('circle', False))
+        cached = image_cache.get(key)
+        if cached is not None:
+            images[item['id']] = cached
+        else:
+            jobs.append((item, key))
+    
+    remaining = [len(jobs)]
+    lock = threading.Lock()
     
-    return images
+    def finish():
+        icons = atlas.get_atlas()
+        for item_id, key in atlas_keys.items():
+            # None if the atlas was swapped out since the card asked for it
+            photo = icons.photo(key) if icons else None
+            if photo is not None:
+                images[item_id] = photo
+        create_photos(decoded, images, on_ready)
+    
+    def on_decoded(future, item, key):
+        try:
+            size, pixels = future.result()
+            with lock:
+                decoded.append((item['id'], key, size, pixels))
+        except Exception as e:
+            print(f"Error loading {item['id']}: {e}")
+        with lock:
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if done:
+            root.after(0, finish)
+    
+    if not jobs:
+        root.after(0, finish)
+        return
+    for item, key in jobs:
+        future = decode_pool.submit(media.decode_rgba, item['image_url'], item.get('max_size'), item.get('circle', False))
+        future.add_done_callback(lambda f, item=item, key=key: on_decoded(f, item, key))
+
+def create_photos(decoded, images, on_ready):
+    """Turn decoded RGBA buffers into PhotoImages, PHOTO_BATCH per Tk event-loop turn"""
+    batch, rest = decoded[:PHOTO_BATCH], decoded[PHOTO_BATCH:]
+    for item_id, key, size, pixels in batch:
+        try:
+            photo = ImageTk.PhotoImage(Image.frombuffer("RGBA", size, pixels, "raw", "RGBA", 0, 1))
+        except Exception as e:
+            print(f"Error creating image {item_id}: {e}")
+            continue
+        image_cache.put(key, photo, image_cost(*size))
+        images[item_id] = photo
+    if rest:
+        root.after(0, lambda: create_photos(rest, images, on_ready))
+    else:
+        on_ready(images)
 
 # --- GUI setup ---
 root = tk.Tk()
@@ -237,20 +237,15 @@ players_inner_frame.bind("<Configure>", on_players_configure)
 players_canvas.bind("<Configure>", on_players_configure)
 
 current_match_id = None
+current_snapshot = None
 current_players = []
-player_widgets = []
+# PUUID -> that player's card widgets, reused across refreshes
+player_widgets = {}
 
 def get_agent_icon_url(character_id):
-    """Get agent icon from Valorant API"""
+    """Get agent icon from the content catalog"""
     try:
-        agents_data = valapi.load_cached('agents')
-        if not agents_data:
-            agents_data = valapi.fetch_and_cache('agents', 'agents')
-        
-        if agents_data and agents_data.get("status") == 200:
-            for agent in agents_data.get("data", []):
-                if agent.get("uuid", "").lower() == character_id.lower():
-                    return agent.get("displayIcon")
+        return content.get_catalog().agent_icon_url(character_id)
     except:
         pass
     return None
@@ -265,13 +260,31 @@ def get_rank_icon_url(tier):
     base_url = "https://media.valorant-api.com/competitivetiers/03621f52-342b-cf4e-4f86-9350a49c6d04"
     return f"{base_url}/{tier}/largeicon.png"
 
-def create_player_card(parent, player, index):
+def atlas_items():
+    """Every agent icon and rank badge a player card can show, at card size"""
+    items = {}
+    for agent_id, url in content.get_catalog().agent_icons.items():
+        if url:
+            items[f"agent:{agent_id}"] = (url, (50, 50), True)
+    for tier in range(3, 28):
+        items[f"rank:{tier}"] = (get_rank_icon_url(tier), (45, 45), False)
+    return items
+
+def build_icon_atlas():
+    """Map the icon atlas, rendering it first if the content changed"""
+    try:
+        atlas.ensure(atlas_items(), valapi.load_manifest().get("version"))
+    except Exception as e:
+        print(f"[!] Icon atlas unavailable: {e}")
+
+def create_player_card(parent, player):
     """Create a modern player card with icons"""
     # Card background with hover effect
     card = tk.Frame(parent, bg="#232a33", cursor="hand2", height=70)
-    card.pack(fill="x", pady=5, padx=5)
     card.pack_propagate(False)
     
+    widgets = {'card': card, 'player': player, 'agent_image': None, 'rank_image': None}
+    
     # Hover effects
     def on_enter(e):
         card.config(bg="#2a313c")
@@ -280,7 +293,8 @@ def create_player_card(parent, player, index):
         card.config(bg="#232a33")
     
     def on_click(e):
-        show_loadout_popup(player)
+        # the card outlives a single snapshot, so open the latest one
+        show_loadout_popup(widgets['player'])
     
     card.bind("<Enter>", on_enter)
     card.bind("<Leave>", on_leave)
@@ -321,7 +335,34 @@ def create_player_card(parent, player, index):
     rank_label.pack(expand=True)
     rank_label.bind("<Button-1>", on_click)
     
-    return card, agent_label, rank_label
+    widgets.update(agent_label=agent_label, rank_label=rank_label,
+                   name_label=name_label, team_label=team_label)
+    return widgets
+
+def update_player_card(widgets, player, agent_image, rank_image):
+    """Bring an existing card up to date, touching only what changed"""
+    old = widgets['player']
+    widgets['player'] = player
+    
+    if player.ign.username != old.ign.username:
+        widgets['name_label'].config(text=player.ign.username)
+    
+    if player.team_id != old.team_id:
+        widgets['team_label'].config(
+            text=f"Team {player.team_id}",
+            fg="#5cb85c" if player.team_id.lower() == "blue" else "#d9534f"
+        )
+    
+    # the label keeps a reference so the image is not garbage collected
+    if agent_image is not widgets['agent_image']:
+        widgets['agent_label'].config(image=agent_image or "")
+        widgets['agent_label'].image = agent_image
+        widgets['agent_image'] = agent_image
+    
+    if rank_image is not widgets['rank_image']:
+        widgets['rank_label'].config(image=rank_image or "")
+        widgets['rank_label'].image = rank_image
+        widgets['rank_image'] = rank_image
 
 def show_loadout_popup(player):
     """Show loadout popup with improved design"""
@@ -345,17 +386,24 @@ def show_loadout_popup(player):
     )
     loading_label.pack(expand=True)
     
+    # set once the popup's widgets exist
+    render_stats = None
+    
     def load_and_display():
-        loadout_data = live_match.get_player_loadout_organized(current_match_id, player.puuid)
+        loadout_data = live_match.get_player_loadout_organized(current_match_id, player.puuid, current_snapshot)
         
         if not loadout_data:
             loadout_data = {'player_card': None, 'weapons': [], 'melee': None, 'sprays': []}
         
-        # Fetch player stats
+        # Cached stats come back immediately; stale fields refresh in the background
+        def on_stats_update(new_stats):
+            popup.after(0, lambda: render_stats(new_stats) if render_stats and popup.winfo_exists() else None)
+        
         player_stats = None
         try:
             parts = player.ign.username.split('#')
-            player_stats = live_match.get_player_stats(parts[0], parts[1] if len(parts) > 1 else 'NA1')
+            player_stats = stats.get_stats(player.puuid, parts[0], parts[1] if len(parts) > 1 else 'NA1',
+                                           on_update=on_stats_update)
         except Exception as e:
             print(f"Stats fetch error: {e}")
         
@@ -375,7 +423,14 @@ def show_loadout_popup(player):
             if spray.get('image_url'):
                 images_to_load.append({'id': f'spray_{i}', 'image_url': spray['image_url'], 'max_size': (65, 65)})
         
-        popup.images = load_all_images_parallel(images_to_load)
+        # Widgets are built on the Tk thread once the images are decoded
+        load_images(images_to_load, lambda images: display(loadout_data, player_stats, images))
+    
+    def display(loadout_data, player_stats, images):
+        nonlocal render_stats
+        if not popup.winfo_exists():
+            return
+        popup.images = images
         loading_frame.destroy()
         
         # Main layout with modern design
@@ -395,11 +450,8 @@ def show_loadout_popup(player):
                               font=("Segoe UI", 18, "bold"), bg="#1a1f26", fg="#ffffff")
         player_name.pack(anchor="w")
         
-        if player_stats:
-            subtitle = tk.Label(name_frame, 
-                              text=f"{player_stats.get('rank', 'Unranked')} • {player_stats.get('win_rate', 0)}% WR",
-                              font=body_font, bg="#1a1f26", fg="#8b96a5")
-            subtitle.pack(anchor="w")
+        subtitle = tk.Label(name_frame, text="", font=body_font, bg="#1a1f26", fg="#8b96a5")
+        subtitle.pack(anchor="w")
         
         # Left sidebar
         left = tk.Frame(main, bg="#0f1419", width=200)
@@ -414,8 +466,18 @@ def show_loadout_popup(player):
             card_lbl.pack(padx=10, pady=10)
         
         # Stats section
-        if player_stats:
-            stats_container = tk.Frame(left, bg="#1a1f26")
+        stats_slot = tk.Frame(left, bg="#0f1419")
+        stats_slot.pack(fill="x")
+        
+        def render_stats(player_stats):
+            for widget in stats_slot.winfo_children():
+                widget.destroy()
+            if not player_stats:
+                return
+            
+            subtitle.config(text=f"{player_stats.get('rank') or 'Unranked'} • {player_stats.get('win_rate') or 0}% WR")
+            
+            stats_container = tk.Frame(stats_slot, bg="#1a1f26")
             stats_container.pack(fill="x", pady=(0, 15))
             
             stats_title = tk.Label(stats_container, text="COMPETITIVE STATS", 
@@ -444,6 +506,8 @@ def show_loadout_popup(player):
             if player_stats.get('hs_rate') is not None:
                 create_stat_row(stats_container, "Headshot%", f"{player_stats['hs_rate']}%")
         
+        render_stats(player_stats)
+        
         # Sprays section
         if loadout_data.get('sprays'):
             spray_container = tk.Frame(left, bg="#1a1f26")
@@ -522,109 +586,141 @@ def show_loadout_popup(player):
     
     threading.Thread(target=load_and_display, daemon=True).start()
 
-def refresh_data():
-    global current_match_id, current_players, player_widgets
+def on_pipeline_update(snapshot, state, error):
+    """Pipeline subscriber: runs on the scheduler thread, renders on the Tk thread"""
+    if error is not None:
+        message = f"Error: {str(error)[:30]}"
+        root.after(0, lambda: match_label.config(text=message))
+        return
+    if snapshot is None:
+        root.after(0, lambda: match_label.config(text="In menus"))
+        return
+    
+    if snapshot.match_id != current_match_id:
+        print(f"[*] Image cache: {image_cache.stats()}")
+    
+    # Agent/rank icons come straight from the atlas; anything missing from it
+    # is decoded on the image pool
+    icons = atlas.get_atlas()
+    images_to_load = []
+    
+    for p in snapshot.players:
+        if icons and f"agent:{p.character_id}" in icons:
+            images_to_load.append({'id': f'agent_{p.puuid}', 'atlas': f"agent:{p.character_id}"})
+        elif p.character_id:
+            agent_url = get_agent_icon_url(p.character_id)
+            if agent_url:
+                images_to_load.append({
+                    'id': f'agent_{p.puuid}', 
+                    'image_url': agent_url, 
+                    'max_size': (50, 50),
+                    'circle': True
+                })
+        
+        if icons and f"rank:{p.rank_tier}" in icons:
+            images_to_load.append({'id': f'rank_{p.puuid}', 'atlas': f"rank:{p.rank_tier}"})
+        elif p.rank_tier > 0:
+            rank_url = get_rank_icon_url(p.rank_tier)
+            if rank_url:
+                images_to_load.append({
+                    'id': f'rank_{p.puuid}',
+                    'image_url': rank_url,
+                    'max_size': (45, 45)
+                })
+    
+    # Render on the Tk thread once every icon is ready
+    load_images(images_to_load, lambda loaded_images: render_match(snapshot, loaded_images))
+
+def on_game_state(state):
+    """Called by the event watcher whenever our game state changes"""
+    print(f"[*] Game state: {state}")
+    scheduler.set_state(state)
+
+def set_text(label, text):
+    if label.cget("text") != text:
+        label.config(text=text)
+
+def render_match(snapshot, loaded_images):
+    """Reconcile the player list with a snapshot (Tk thread only)
+    
+    Cards are keyed by PUUID: players already shown keep their card and only
+    changed fields are updated; cards are created, removed or re-packed only
+    when the roster or its order changes.
+    """
+    global current_match_id, current_snapshot, current_players
     try:
-        login.ensure_logged_in()
-        details, blue, red = live_match.get_live_match()
-        match_label.config(text=details.game_mode)
-        map_label.config(text=details.map_name)
-        server_label.config(text=details.server.split('.')[-1].upper()[:15])
-
-        _, match_id = live_match.detect_match()
-        current_match_id = match_id
-        current_players = blue + red
-
-        # Clear existing player cards
-        for widget in players_inner_frame.winfo_children():
-            widget.destroy()
-        
-        player_widgets = []
-        
-        # Collect all agent/rank data to load in parallel
-        images_to_load = []
-        
-        for i, p in enumerate(current_players):
-            # Get character ID from match data
-            try:
-                url = f"https://glz-{constants.SHARD}-1.{get_real_region()}.a.pvp.net/core-game/v1/matches/{match_id}"
-                headers = {
-                    "Authorization": f"Bearer {constants.ACCESS_TOKEN}",
-                    "X-Riot-Entitlements-JWT": constants.ENTITLEMENTS_TOKEN,
-                }
-                r = requests.get(url, headers=headers, verify=False, timeout=5)
-                if r.status_code == 200:
-                    match_data = r.json()
-                    for player_data in match_data.get("Players", []):
-                        if player_data.get("Subject") == p.puuid:
-                            char_id = player_data.get("CharacterID")
-                            if char_id:
-                                agent_url = get_agent_icon_url(char_id)
-                                if agent_url:
-                                    images_to_load.append({
-                                        'id': f'agent_{i}', 
-                                        'image_url': agent_url, 
-                                        'max_size': (50, 50),
-                                        'circle': True
-                                    })
-                            
-                            # Get rank tier
-                            tier = player_data.get("SeasonalBadgeInfo", {}).get("Rank", 0)
-                            if tier > 0:
-                                rank_url = get_rank_icon_url(tier)
-                                if rank_url:
-                                    images_to_load.append({
-                                        'id': f'rank_{i}',
-                                        'image_url': rank_url,
-                                        'max_size': (45, 45)
-                                    })
-                            break
-            except:
-                pass
-        
-        # Load all icons in parallel
-        loaded_images = load_all_images_parallel(images_to_load)
-        
-        # Create player cards with loaded images
-        for i, p in enumerate(current_players):
-            card, agent_label, rank_label = create_player_card(players_inner_frame, p, i)
+        details = snapshot.details
+        set_text(match_label, details.game_mode)
+        set_text(map_label, details.map_name)
+        set_text(server_label, details.server.split('.')[-1].upper()[:15])
+
+        current_snapshot = snapshot
+        current_match_id = snapshot.match_id
+        previous_order = [p.puuid for p in current_players]
+        current_players = snapshot.players
+        order = [p.puuid for p in current_players]
+        
+        # Players who left (or a new match): drop their cards
+        for puuid in set(player_widgets) - set(order):
+            player_widgets.pop(puuid)['card'].destroy()
+        
+        created = False
+        for p in current_players:
+            widgets = player_widgets.get(p.puuid)
+            if widgets is None:
+                widgets = player_widgets[p.puuid] = create_player_card(players_inner_frame, p)
+                created = True
+            update_player_card(widgets, p, loaded_images.get(f'agent_{p.puuid}'),
+                               loaded_images.get(f'rank_{p.puuid}'))
+        
+        if created or order != previous_order:
+            for puuid in order:
+                player_widgets[puuid]['card'].pack_forget()
+            for puuid in order:
+                player_widgets[puuid]['card'].pack(fill="x", pady=5, padx=5)
             
-            # Set agent icon if loaded
-            if f'agent_{i}' in loaded_images:
-                agent_label.config(image=loaded_images[f'agent_{i}'])
-                agent_label.image = loaded_images[f'agent_{i}']
-            
-            # Set rank icon if loaded
-            if f'rank_{i}' in loaded_images:
-                rank_label.config(image=loaded_images[f'rank_{i}'])
-                rank_label.image = loaded_images[f'rank_{i}']
-            
-            player_widgets.append(card)
-        
-        # Update scroll region
-        players_inner_frame.update_idletasks()
-        players_canvas.configure(scrollregion=players_canvas.bbox("all"))
+            # Update scroll region
+            players_inner_frame.update_idletasks()
+            players_canvas.configure(scrollregion=players_canvas.bbox("all"))
         
     except Exception as e:
         match_label.config(text=f"Error: {str(e)[:30]}")
-    
-    root.after(10000, refresh_data)
+
+def reload_content(changed):
+    """Rebuild the content catalog after a background refresh rewrote datasets"""
+    pipeline.reload_content(changed)
+    # media stored under the previous content version gets revalidated on next use
+    media.get_cache().version = valapi.load_manifest().get("version")
+    build_icon_atlas()
+
+def dump_metrics(event=None):
+    """F9: write request/cache/refresh metrics next to the other app data"""
+    json_path = constants.APP_DATA_DIR / "metrics.json"
+    prom_path = constants.APP_DATA_DIR / "metrics.prom"
+    json_path.write_text(metrics.to_json(), encoding="utf-8")
+    prom_path.write_text(metrics.to_prometheus(), encoding="utf-8")
+    print(f"[+] Metrics written to {json_path} and {prom_path}")
+    print(f"[*] Cache hit rates: {metrics.hit_rates()}")
+
+root.bind("<F9>", dump_metrics)
 
 def init_app():
     print("[*] Initializing Valoripper...")
-    valapi.ensure_static_data()
-    live_match.load_skin_map()
+    pipeline.load_content()
+    build_icon_atlas()
     
-    # Cache agents data for icons
-    try:
-        agents_data = valapi.load_cached('agents')
-        if not agents_data:
-            valapi.fetch_and_cache('agents', 'agents')
-    except:
-        pass
+    # Pick up game patches without blocking startup
+    valapi.refresh_in_background(on_change=reload_content)
     
     print("[+] Ready!")
 
+replay.configure()
+game_events = events.MatchEventWatcher(on_game_state)
+match_pipeline = pipeline.MatchPipeline(game_events)
+match_pipeline.subscribe(on_pipeline_update)
+scheduler = RefreshScheduler(match_pipeline.cycle)
+
 threading.Thread(target=init_app, daemon=True).start()
-threading.Thread(target=refresh_data, daemon=True).start()
+scheduler.start()
+game_events.start()
 root.mainloop()
\ No newline at end of file
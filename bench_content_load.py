@@ -0,0 +1,25 @@
+from valorip import content, snapshot
+import time
+
+# cold-start comparison: parsing the cached JSON vs opening the compiled snapshot
+RUNS = 5
+
+
+def timed(fn):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+catalog, json_time = timed(content.ContentCatalog.from_json)
+snapshot.write(catalog)
+loaded, snap_time = timed(snapshot.load)
+
+print(f"json     {json_time * 1000:8.1f} ms  ({len(catalog.skin_names)} skin variants)")
+print(f"snapshot {snap_time * 1000:8.1f} ms  ({len(loaded.skin_names) if loaded else 0} skin variants)")
+json_bytes = sum(size for _, size in snapshot.source_fingerprint().values())
+print(f"sizes    json {json_bytes / 1e6:.1f} MB, snapshot {snapshot.snapshot_path().stat().st_size / 1e6:.1f} MB")
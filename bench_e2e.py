@@ -0,0 +1,509 @@
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# End-to-end benchmark against local stand-ins for every upstream Valoripper
+# talks to: the local Riot Client API, glz, pd (incl. name-service), Henrik,
+# valorant-api and its media CDN. The real login / live_match / stats / image
+# code runs headlessly in a child process pointed at the stand-ins through
+# riot.url_rewriter: once on an empty data dir (cold start), then again on
+# the same dir (warm start). Every stage reports wall time plus requests and
+# response bytes per upstream.
+#
+#   python bench_e2e.py --latency glz=40 --latency pd=60 --errors henrik=0.05
+
+UPSTREAMS = ("local", "glz", "pd", "henrik", "valapi", "media")
+MATCH_PATH = "match_debug.json"
+SKINS_PATH = os.path.join("valorip", "skins.json")
+STEADY_TICKS = 5
+LOCAL_PORT = 2999
+SKIN_SOCKET = "3ad1b2b2-acdb-4524-852f-954a76ddae0a"
+MEDIA_HOST = "https://media.valorant-api.com"
+RANK_ICON_BASE = MEDIA_HOST + "/competitivetiers/03621f52-342b-cf4e-4f86-9350a49c6d04"
+
+
+def _uuid(*parts):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "/".join(map(str, parts))))
+
+
+def _fake_jwt(lifetime=3600):
+    def part(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    return f"{part({'alg': 'none'})}.{part({'exp': int(time.time()) + lifetime})}.sig"
+
+
+class MockWorld:
+    """Deterministic upstream data built around the recorded match_debug.json."""
+
+    def __init__(self, seed=1):
+        rng = random.Random(seed)
+        with open(MATCH_PATH, encoding="utf-8") as f:
+            self.match = json.load(f)
+        with open(SKINS_PATH, encoding="utf-8") as f:
+            self.skins = json.load(f)
+        self.match_id = self.match["MatchID"]
+        self.players = [p["Subject"] for p in self.match["Players"]]
+        self.self_puuid = self.players[0]
+        self.names = {puuid: (f"Player{i}", "EUW") for i, puuid in enumerate(self.players)}
+
+        skin_ids = [s["uuid"] for s in self.skins.get("data", [])]
+        self.weapons = [
+            {"uuid": _uuid("weapon", i), "displayName": f"Weapon {i}",
+             "category": "EEquippableCategory::Melee" if i == 0 else "EEquippableCategory::Rifle"}
+            for i in range(18)
+        ]
+        self.sprays = [
+            {"uuid": _uuid("spray", i), "displayName": f"Spray {i}",
+             "fullTransparentIcon": f"{MEDIA_HOST}/sprays/{_uuid('spray', i)}/fulltransparenticon.png"}
+            for i in range(30)
+        ]
+        agent_ids = {p.get("CharacterID") for p in self.match["Players"] if p.get("CharacterID")}
+        agent_ids |= {_uuid("agent", i) for i in range(25 - len(agent_ids))}
+        self.agents = [
+            {"uuid": agent_id, "displayIcon": f"{MEDIA_HOST}/agents/{agent_id}/displayicon.png"}
+            for agent_id in sorted(agent_ids)
+        ]
+        card_ids = {(p.get("PlayerIdentity") or {}).get("PlayerCardID") for p in self.match["Players"]}
+        self.cards = [
+            {"uuid": card_id, "largeArt": f"{MEDIA_HOST}/playercards/{card_id}/largeart.png"}
+            for card_id in sorted(c for c in card_ids if c)
+        ]
+        self.loadouts = {
+            "Loadouts": [
+                {
+                    "Subject": puuid,
+                    "Loadout": {
+                        "Items": {
+                            w["uuid"]: {"Sockets": {SKIN_SOCKET: {"Item": {"ID": rng.choice(skin_ids)}}}}
+                            for w in self.weapons
+                        },
+                        "Sprays": [{"EquippedSprayID": rng.choice(self.sprays)["uuid"]} for _ in range(3)],
+                    },
+                }
+                for puuid in self.players
+            ]
+        }
+        self.history = {
+            puuid: [
+                {"id": _uuid("match", puuid, i), "start": 1_700_000_000 - i * 3600,
+                 "kills": rng.randint(5, 30), "deaths": rng.randint(5, 25),
+                 "headshots": rng.randint(2, 20), "bodyshots": rng.randint(10, 60), "legshots": rng.randint(0, 8)}
+                for i in range(100)
+            ]
+            for puuid in self.players
+        }
+        self.datasets = {
+            "weapons/skins": self.skins,
+            "playercards": {"status": 200, "data": self.cards},
+            "sprays": {"status": 200, "data": self.sprays},
+            "agents": {"status": 200, "data": self.agents},
+            "weapons": {"status": 200, "data": self.weapons},
+            "version": {"status": 200, "data": {"manifestId": "BENCH", "version": "bench",
+                                                 "riotClientVersion": "release-bench"}},
+        }
+        self._png_cache = {}
+        self._png_lock = threading.Lock()
+
+    def png(self, path):
+        """A distinct (per path) PNG, like a real icon or weapon render."""
+        with self._png_lock:
+            data = self._png_cache.get(path)
+        if data is None:
+            from PIL import Image
+
+            digest = hashlib.sha256(path.encode()).digest()
+            size = (512, 256) if "weaponskin" in path else (256, 256)
+            buf = io.BytesIO()
+            Image.new("RGBA", size, (digest[0], digest[1], digest[2], 255)).save(buf, "PNG")
+            data = buf.getvalue()
+            with self._png_lock:
+                self._png_cache[path] = data
+        return data
+
+    def puuid_for(self, name):
+        return next((p for p, (n, _) in self.names.items() if n.lower() == name.lower()), None)
+
+
+class MockUpstreams:
+    """One HTTP server for all stand-ins; the first path segment picks the upstream."""
+
+    def __init__(self, world, latency=None, errors=None, host="127.0.0.1", port=0):
+        self.world = world
+        self.latency = latency or {}
+        self.errors = errors or {}
+        self.counters = {name: {"requests": 0, "bytes": 0, "errors": 0} for name in UPSTREAMS}
+        self._lock = threading.Lock()
+        self._rng = random.Random(7)
+        self.httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self.counters))
+
+    def record(self, upstream, size, error=False):
+        with self._lock:
+            counter = self.counters[upstream]
+            counter["requests"] += 1
+            counter["bytes"] += size
+            counter["errors"] += int(error)
+
+    def fail(self, upstream):
+        rate = self.errors.get(upstream, 0)
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle("HEAD")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def _handle(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        parts = urlsplit(self.path)
+        if parts.path == "/__stats":
+            return self._send(200, json.dumps(mock.snapshot()).encode(), "application/json")
+
+        upstream, _, path = parts.path.lstrip("/").partition("/")
+        if upstream not in mock.counters:
+            return self._send(404, b"{}", "application/json")
+        time.sleep(mock.latency.get(upstream, 0) / 1000)
+        if mock.fail(upstream):
+            return self._send(503, b'{"error": "injected"}', "application/json", upstream, error=True)
+
+        status, payload, content_type, headers = self._route(
+            mock.world, upstream, "/" + path, parse_qs(parts.query), method, body
+        )
+        if content_type == "application/json" and not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+        etag = headers.get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", content_type, upstream, headers=headers)
+        self._send(status, payload if method != "HEAD" else b"", content_type, upstream, headers=headers)
+
+    def _route(self, world, upstream, path, query, method, body):
+        json_type = "application/json"
+        seg = path.strip("/").split("/")
+        if upstream == "local":
+            if path == "/entitlements/v1/token":
+                return 200, {"accessToken": _fake_jwt(), "token": "bench-entitlements",
+                             "subject": world.self_puuid}, json_type, {}
+            if path == "/product-session/v1/external-sessions":
+                return 200, {"valorant": {"launchConfiguration": {
+                    "arguments": ["--region=eu", "--shard=eu"]}}}, json_type, {}
+        elif upstream == "glz":
+            if seg[:3] == ["core-game", "v1", "players"]:
+                return 200, {"MatchID": world.match_id}, json_type, {}
+            if seg[:3] == ["core-game", "v1", "matches"] and len(seg) == 4:
+                return 200, world.match, json_type, {}
+            if seg[:3] == ["core-game", "v1", "matches"] and seg[-1] == "loadouts":
+                return 200, world.loadouts, json_type, {}
+        elif upstream == "pd":
+            if path == "/name-service/v2/players" and method == "PUT":
+                return 200, [
+                    {"Subject": puuid, "GameName": world.names[puuid][0], "TagLine": world.names[puuid][1]}
+                    for puuid in body or [] if puuid in world.names
+                ], json_type, {}
+            if seg[:3] == ["mmr", "v1", "players"] and len(seg) == 4:
+                return 200, {
+                    "LatestCompetitiveUpdate": {"TierAfterUpdate": 14, "RankedRatingAfterUpdate": 37, "SeasonID": "act"},
+                    "QueueSkills": {"competitive": {"SeasonalInfoBySeasonID": {
+                        "act": {"NumberOfWins": 12, "NumberOfGames": 22, "CompetitiveTier": 14, "WinsByTier": {"14": 5, "15": 1}},
+                    }}},
+                }, json_type, {}
+            if seg[:3] == ["mmr", "v1", "players"] and seg[-1] == "competitiveupdates":
+                start = int(query.get("startIndex", ["0"])[0])
+                end = int(query.get("endIndex", ["20"])[0])
+                history = world.history.get(seg[3], [])
+                return 200, {"Matches": [{"MatchID": m["id"]} for m in history[start:end]]}, json_type, {}
+            if seg[:3] == ["match-details", "v1", "matches"]:
+                for puuid, history in world.history.items():
+                    for m in history:
+                        if m["id"] == seg[3]:
+                            return 200, {
+                                "matchInfo": {"gameStartMillis": m["start"] * 1000},
+                                "players": [{"subject": puuid, "stats": {"kills": m["kills"], "deaths": m["deaths"]}}],
+                                "roundResults": [{"playerStats": [{"subject": puuid, "damage": [
+                                    {k: m[k] for k in ("headshots", "bodyshots", "legshots")}]}]}],
+                            }, json_type, {}
+            if seg[:2] == ["personalization", "v2"]:
+                return 200, {"Guns": [], "Sprays": []}, json_type, {}
+        elif upstream == "henrik":
+            if seg[:2] == ["v3", "mmr"]:
+                return 200, {"status": 200, "data": {
+                    "current": {"tier": {"name": "Gold 3"}, "rr": 37},
+                    "peak": {"tier": {"name": "Platinum 1"}},
+                    "seasonal": [{"wins": 12, "games": 22}],
+                }}, json_type, {}
+            if seg[:2] == ["v1", "account"]:
+                puuid = world.puuid_for(seg[2])
+                return (200 if puuid else 404), {"status": 200, "data": {"puuid": puuid}}, json_type, {}
+            if seg[:3] == ["v3", "by-puuid", "matches"]:
+                puuid = seg[4]
+                size = int(query.get("size", ["10"])[0])
+                name, tag = world.names.get(puuid, ("", ""))
+                return 200, {"status": 200, "data": [
+                    {"metadata": {"matchid": m["id"], "game_start": m["start"]},
+                     "players": {"red": [{"puuid": puuid, "name": name, "tag": tag, "stats": {
+                         k: m[k] for k in ("kills", "deaths", "headshots", "bodyshots", "legshots")}}]}}
+                    for m in world.history.get(puuid, [])[:size]
+                ]}, json_type, {}
+        elif upstream == "valapi":
+            endpoint = path.strip("/").removeprefix("v1/")
+            if endpoint in world.datasets:
+                data = json.dumps(world.datasets[endpoint]).encode()
+                etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                return 200, data, json_type, {"ETag": etag}
+        elif upstream == "media":
+            data = world.png(path)
+            return 200, data, "image/png", {"ETag": '"' + hashlib.sha1(data).hexdigest()[:16] + '"'}
+        return 404, {"error": "not mocked"}, json_type, {}
+
+    def _send(self, status, payload, content_type, upstream=None, headers=None, error=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+        if upstream:
+            self.server.mock.record(upstream, len(payload), error)
+
+
+def make_rewriter(mock_url):
+    """Map every real upstream URL onto the matching stand-in path."""
+    mock_netloc = urlsplit(mock_url).netloc
+
+    def rewrite(url):
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        if parts.netloc == mock_netloc:
+            return url
+        if host == "127.0.0.1":
+            upstream, path = "local", parts.path
+        elif host.startswith("glz-"):
+            upstream, path = "glz", parts.path
+        elif host.startswith("pd."):
+            upstream, path = "pd", parts.path
+        elif host == "api.henrikdev.xyz":
+            upstream, path = "henrik", parts.path.removeprefix("/valorant")
+        elif host == "media.valorant-api.com":
+            upstream, path = "media", parts.path
+        elif host == "valorant-api.com":
+            upstream, path = "valapi", parts.path
+        else:
+            return url
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{mock_url}/{upstream}{path}{query}"
+
+    return rewrite
+
+
+# --- client side (runs in a fresh process per start) ---
+
+def run_client(mock_url, ticks, stats_backend, client_limits):
+    from valorip import atlas, constants, content, live_match, live_match_async, login, media, pipeline, riot_stats, stats, valapi
+    from valorip.client import riot
+    import asyncio
+
+    riot.url_rewriter = make_rewriter(mock_url)
+    constants.STATS_BACKEND = stats_backend
+    if not client_limits:
+        for limiter in (live_match.henrik_limiter, riot_stats.pd_limiter):
+            limiter.rate = limiter.capacity = limiter.tokens = 1000
+    lockfile = constants.APP_DATA_DIR / "bench_lockfile"
+    lockfile.write_text(f"Riot Client:1234:{LOCAL_PORT}:benchpass:https", encoding="utf-8")
+    login.credentials.lockfile_path = str(lockfile)
+
+    stages = []
+
+    def counters():
+        with urllib.request.urlopen(f"{mock_url}/__stats") as r:
+            return json.loads(r.read())
+
+    def stage(name, fn):
+        before = counters()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        after = counters()
+        by_upstream = {
+            u: {k: after[u][k] - before[u][k] for k in after[u]}
+            for u in after if after[u]["requests"] != before[u]["requests"]
+        }
+        stages.append({
+            "stage": name,
+            "ms": round(elapsed * 1000, 1),
+            "requests": sum(c["requests"] for c in by_upstream.values()),
+            "bytes": sum(c["bytes"] for c in by_upstream.values()),
+            "errors": sum(c["errors"] for c in by_upstream.values()),
+            "upstreams": by_upstream,
+        })
+        return result
+
+    def get_snapshot():
+        return asyncio.run(live_match_async.get_match_snapshot())
+
+    def prefetch(snapshot):
+        for thread in stats.prefetch_match(snapshot) or []:
+            thread.join()
+
+    def card_icons():
+        items = {f"agent:{agent_id}": (url, (50, 50), True)
+                 for agent_id, url in content.get_catalog().agent_icons.items() if url}
+        items.update({f"rank:{tier}": (f"{RANK_ICON_BASE}/{tier}/largeicon.png", (45, 45), False)
+                      for tier in range(3, 28)})
+        return atlas.ensure(items, valapi.load_manifest().get("version"))
+
+    decode_pool = ThreadPoolExecutor(max_workers=4)
+
+    def open_popups(snapshot):
+        for player in snapshot.players:
+            loadout = live_match.get_player_loadout_organized(snapshot.match_id, player.puuid, snapshot)
+            name, _, tag = player.ign.username.partition("#")
+            stats.get_stats(player.puuid, name, tag or "NA1")
+            jobs = []
+            if loadout.get("player_card"):
+                jobs.append((loadout["player_card"], (180, 280)))
+            jobs += [(w["image_url"], (220, 110)) for w in loadout["weapons"] if w.get("image_url")]
+            if loadout.get("melee") and loadout["melee"].get("image_url"):
+                jobs.append((loadout["melee"]["image_url"], (480, 150)))
+            jobs += [(s["image_url"], (65, 65)) for s in loadout["sprays"] if s.get("image_url")]
+            futures = [decode_pool.submit(media.decode_rgba, url, size) for url, size in jobs]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[!] Image failed: {e}")
+
+    stage("static data", pipeline.load_content)
+    stage("content refresh", valapi.refresh_static_data)
+    stage("login", login.ensure_logged_in)
+    snapshot = stage("first tick", get_snapshot)
+    stage("stats prefetch", lambda: prefetch(snapshot))
+    stage("card icons", card_icons)
+    for i in range(ticks):
+        snapshot = stage(f"steady tick {i + 1}", get_snapshot)
+    stage("all popups", lambda: open_popups(snapshot))
+    stage("all popups again", lambda: open_popups(snapshot))
+    decode_pool.shutdown()
+    return stages
+
+
+# --- orchestration ---
+
+def _parse_pairs(values, cast):
+    pairs = {}
+    for value in values or []:
+        name, _, amount = value.partition("=")
+        if name not in UPSTREAMS:
+            raise SystemExit(f"unknown upstream {name!r} (one of {', '.join(UPSTREAMS)})")
+        pairs[name] = cast(amount)
+    return pairs
+
+
+def _print_report(label, stages):
+    print(f"\n== {label} ==")
+    print(f"{'stage':<20}{'ms':>10}{'reqs':>7}{'KiB':>10}{'errs':>6}  by upstream")
+    for s in stages:
+        detail = ", ".join(f"{u}:{c['requests']}" for u, c in sorted(s["upstreams"].items()))
+        print(f"{s['stage']:<20}{s['ms']:>10.1f}{s['requests']:>7}{s['bytes'] / 1024:>10.1f}{s['errors']:>6}  {detail}")
+    ticks = [s for s in stages if s["stage"].startswith("steady tick")]
+    if ticks:
+        print(f"steady tick mean: {sum(s['ms'] for s in ticks) / len(ticks):.1f} ms, "
+              f"{sum(s['requests'] for s in ticks) / len(ticks):.1f} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against local upstream stand-ins")
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=MS",
+                        help=f"added latency per request; upstreams: {', '.join(UPSTREAMS)}")
+    parser.add_argument("--errors", action="append", metavar="UPSTREAM=RATE",
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--ticks", type=int, default=STEADY_TICKS)
+    parser.add_argument("--stats-backend", default="henrik", choices=("henrik", "riot"))
+    parser.add_argument("--no-client-limits", action="store_true",
+                        help="lift the Henrik/pd token buckets so they do not dominate timings")
+    parser.add_argument("--json", metavar="PATH", help="also write the raw results here")
+    parser.add_argument("--verbose", action="store_true", help="show the client's own log output")
+    parser.add_argument("--client", metavar="MOCK_URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        # child: HOME already points at the bench data dir
+        stages = run_client(args.client, args.ticks, args.stats_backend, not args.no_client_limits)
+        print("BENCH_RESULT " + json.dumps(stages))
+        return
+
+    mock = MockUpstreams(MockWorld(), _parse_pairs(args.latency, float), _parse_pairs(args.errors, float)).start()
+    data_dir = tempfile.mkdtemp(prefix="valoripper-bench-")
+    env = dict(os.environ, HOME=data_dir, USERPROFILE=data_dir)
+    cmd = [sys.executable, os.path.abspath(__file__), "--client", mock.url,
+           "--ticks", str(args.ticks), "--stats-backend", args.stats_backend]
+    if args.no_client_limits:
+        cmd.append("--no-client-limits")
+
+    print(f"[*] Stand-ins on {mock.url}, data dir {data_dir}")
+    results = {}
+    for label in ("cold start", "warm start"):
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        lines = proc.stdout.splitlines()
+        if args.verbose or proc.returncode:
+            print("\n".join(line for line in lines if not line.startswith("BENCH_RESULT ")))
+            print(proc.stderr, end="")
+        result = next((line for line in reversed(lines) if line.startswith("BENCH_RESULT ")), None)
+        if result is None:
+            raise SystemExit(f"[!] {label} run failed (exit {proc.returncode})")
+        results[label] = json.loads(result[len("BENCH_RESULT "):])
+        _print_report(label, results[label])
+
+    mock.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from valorip import content
+import random, time
+
+# compares the indexed skin resolver with the old linear 8-char prefix scan
+catalog = content.get_catalog()
+names = catalog.skin_names
+resolver = content.SkinResolver(names)
+
+
+def linear_scan(sid):
+    name = names.get(sid)
+    if name:
+        return name
+    for k, v in names.items():
+        if k.startswith(sid[:8]) or sid.startswith(k[:8]):
+            return v
+    return None
+
+
+ids = list(names)
+random.seed(1)
+queries = [random.choice(ids) for _ in range(200)]
+queries += [random.choice(ids)[:8] + "-ffff-ffff-ffff-ffffffffffff" for _ in range(200)]
+queries += [f"{random.getrandbits(128):032x}" for _ in range(50)] * 4
+
+for label, fn in (("linear", linear_scan), ("indexed", lambda q: resolver.resolve(q)[0])):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    elapsed = time.perf_counter() - start
+    print(f"{label:8s} {len(queries)} lookups in {elapsed * 1000:.2f} ms")
+
+mismatches = sum(linear_scan(q) != resolver.resolve(q)[0] for q in queries)
+print(f"mismatches: {mismatches}")
+print(f"sources: {resolver.counts}")
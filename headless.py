@@ -0,0 +1,48 @@
+import argparse
+
+from valorip import constants, events, pipeline, replay, server, valapi
+from valorip.scheduler import RefreshScheduler
+
+# Runs the refresh pipeline once, without the Tk window, and serves the
+# snapshot, loadouts and cached stats to any number of local consumers
+# (overlays, second monitors, scripts) over HTTP and a websocket.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Valoripper snapshot server")
+    parser.add_argument("--host", default=server.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=server.SERVER_PORT)
+    parser.add_argument("--record", metavar="LOG", default=constants.RECORD_PATH,
+                        help="append every HTTP exchange to this session log")
+    parser.add_argument("--replay", metavar="LOG", default=constants.REPLAY_PATH,
+                        help="serve a recorded session log instead of going online")
+    parser.add_argument("--speed", choices=replay.SPEEDS, default=constants.REPLAY_SPEED)
+    args = parser.parse_args()
+
+    constants.RECORD_PATH, constants.REPLAY_PATH, constants.REPLAY_SPEED = args.record, args.replay, args.speed
+    replay.configure()
+
+    print("[*] Initializing Valoripper (headless)...")
+    pipeline.load_content()
+    valapi.refresh_in_background(on_change=pipeline.reload_content)
+
+    match_pipeline = pipeline.MatchPipeline()
+    snapshot_server = server.SnapshotServer(match_pipeline, args.host, args.port)
+    scheduler = RefreshScheduler(match_pipeline.cycle)
+    game_events = events.MatchEventWatcher(scheduler.set_state)
+    match_pipeline.watcher = game_events
+
+    scheduler.start()
+    game_events.start()
+    host, port = snapshot_server.address
+    print(f"[+] Serving http://{host}:{port}/api/state and ws://{host}:{port}/ws")
+    try:
+        snapshot_server.serve_forever()
+    except KeyboardInterrupt:
+        print("[*] Shutting down")
+        scheduler.stop()
+        game_events.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import time
+
+from valorip import live_match, metrics, pipeline, replay, riot_stats, stats
+
+# Replays a session log recorded with VALORIPPER_RECORD (or headless.py
+# --record) through the real refresh pipeline, with no network, no Riot
+# client and a throwaway data dir, and reports what every cycle cost. "fast" runs the cycles
+# back to back until the log runs out; "recorded" keeps the session's own
+# timing and latency.
+#
+#   python replay_session.py session.log.gz --speed fast --popups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded Valoripper session offline")
+    parser.add_argument("log")
+    parser.add_argument("--speed", choices=replay.SPEEDS, default="fast")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="seconds between cycles at recorded speed")
+    parser.add_argument("--max-cycles", type=int, default=1000)
+    parser.add_argument("--popups", action="store_true",
+                        help="also open every player's loadout and stats after each new match")
+    parser.add_argument("--metrics", metavar="PATH", help="write the final metrics (JSON) here")
+    args = parser.parse_args()
+
+    tape = replay.start_replay(args.log, args.speed)
+    if args.speed == "fast":
+        # the log already holds whatever the quotas allowed; waiting on them again measures nothing
+        for limiter in (live_match.henrik_limiter, riot_stats.pd_limiter):
+            limiter.rate = limiter.capacity = limiter.tokens = 1e9
+    pipeline.load_content()
+    match_pipeline = pipeline.MatchPipeline()
+    popped = set()
+
+    print(f"{'cycle':>5}{'ms':>10}{'reqs':>6}  state")
+    for cycle in range(1, args.max_cycles + 1):
+        before = metrics.HTTP_REQUESTS.samples()
+        start = time.perf_counter()
+        state = match_pipeline.cycle()
+        elapsed = time.perf_counter() - start
+        made = sum(v for _, v in metrics.HTTP_REQUESTS.samples()) - sum(v for _, v in before)
+        detail = match_pipeline.error or (match_pipeline.snapshot and match_pipeline.snapshot.phase) or ""
+        print(f"{cycle:>5}{elapsed * 1000:>10.1f}{made:>6}  {state} {detail}")
+
+        snapshot = match_pipeline.snapshot
+        if args.popups and snapshot and snapshot.match_id not in popped:
+            popped.add(snapshot.match_id)
+            start = time.perf_counter()
+            for player in snapshot.players:
+                live_match.get_player_loadout_organized(snapshot.match_id, player.puuid, snapshot)
+                name, _, tag = player.ign.username.partition("#")
+                stats.get_stats(player.puuid, name, tag or "NA1")
+            print(f"      popups for {len(snapshot.players)} players: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        if tape.exhausted:
+            break
+        if args.speed == "recorded":
+            time.sleep(args.interval)
+
+    print(f"[*] Cache hit rates: {metrics.hit_rates()}")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(metrics.to_json())
+
+
+if __name__ == "__main__":
+    main()
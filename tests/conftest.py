@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from valorip import constants  # noqa: E402
+
+
+@pytest.fixture
+def app_data(tmp_path, monkeypatch):
+    """Point every cache file at a fresh directory."""
+    monkeypatch.setattr(constants, "APP_DATA_DIR", tmp_path)
+    return tmp_path
+
+
+class StandIn:
+    """Local HTTP server answering GETs from a {path: (body, etag)} table."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stand_in = self
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def set(self, path, data, etag=None):
+        self.routes[path] = (json.dumps(data).encode(), etag)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        stand_in.requests.append((self.path, dict(self.headers)))
+        route = stand_in.routes.get(self.path)
+        if route is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, etag = route
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from PIL import Image
+
+from valorip import atlas, media
+
+ITEMS = {"agent:a": ("a.png", (4, 4), False), "rank:3": ("r.png", (2, 2), False)}
+
+
+@pytest.fixture
+def rendered(app_data, monkeypatch):
+    calls = []
+
+    def load_rendered(url, max_size, circle):
+        calls.append(url)
+        return Image.new("RGBA", max_size, (len(url), 0, 0, 255))
+
+    monkeypatch.setattr(media, "load_rendered", load_rendered)
+    monkeypatch.setattr(atlas, "_atlas", None)
+    yield calls
+    atlas._swap(None)
+
+
+def test_version_learned_later_is_stamped_without_rendering(app_data, rendered):
+    path = app_data / "icons.atlas"
+    first = atlas.ensure(ITEMS, None, path)
+    assert first.version is None and len(rendered) == 2
+
+    stamped = atlas.ensure(ITEMS, "M1", path)
+    assert stamped.version == "M1"
+    assert len(rendered) == 2
+    assert stamped.image("agent:a").getpixel((0, 0)) == (5, 0, 0, 255)
+    assert first.icons == {}
+
+    assert atlas.ensure(ITEMS, "M1", path) is atlas.get_atlas()
+    assert len(rendered) == 2
+    atlas.ensure(ITEMS, "M2", path)
+    assert len(rendered) == 4
+
+
+def test_close_while_reading_icons(app_data, rendered):
+    path = app_data / "icons.atlas"
+    icons = atlas.ensure(ITEMS, "M1", path)
+    errors = []
+
+    def read():
+        for _ in range(2000):
+            try:
+                icons.image("agent:a")
+            except KeyError:
+                return
+            except Exception as e:
+                errors.append(e)
+                return
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    atlas.load(path)
+    reader.join()
+    assert errors == []
+    with pytest.raises(KeyError):
+        icons.image("agent:a")
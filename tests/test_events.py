@@ -0,0 +1,185 @@
+import base64
+import json
+import socket
+import time
+
+import pytest
+
+from valorip import constants, events, live_match_async, login, models, pipeline, ws
+
+SELF = "self-puuid"
+
+
+def _presence(loop_state, flow="Matchmaking", puuid=SELF):
+    private = base64.b64encode(json.dumps({
+        "matchPresenceData": {"sessionLoopState": loop_state, "provisioningFlow": flow},
+    }).encode()).decode()
+    return json.dumps([events.WAMP_EVENT, events.PRESENCE_EVENT, {
+        "data": {"presences": [{"puuid": puuid, "product": "valorant", "private": private}]},
+    }])
+
+
+class FeedStandIn:
+    """Local stand-in for the Riot Client's WAMP websocket."""
+
+    def __init__(self):
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.auth = []
+
+    def accept(self):
+        conn, _ = self.listener.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(1024)
+        headers = dict(
+            line.split(": ", 1) for line in request.decode().split("\r\n")[1:] if ": " in line
+        )
+        self.auth.append(headers.get("Authorization"))
+        conn.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            + f"Sec-WebSocket-Accept: {ws.accept_key(headers['Sec-WebSocket-Key'])}\r\n\r\n".encode()
+        )
+        feed = ws.WebSocket(conn, is_client=False)
+        subscriptions = [json.loads(feed.recv()) for _ in range(2)]
+        return feed, subscriptions
+
+    def close(self):
+        self.listener.close()
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    monkeypatch.setattr(constants, "PUUID", SELF)
+    stand_in = FeedStandIn()
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture
+def watcher(feed):
+    changes = []
+    watcher = events.MatchEventWatcher(
+        changes.append, port=feed.port, password="secret", use_ssl=False, reconnect_delay=0.05,
+    )
+    watcher.changes = changes
+    watcher.start()
+    yield watcher
+    watcher.stop()
+
+
+def test_parse_presence_state():
+    def private(loop_state, flow=""):
+        return base64.b64encode(json.dumps({"sessionLoopState": loop_state, "provisioningFlow": flow}).encode())
+
+    assert events.parse_presence_state(private("MENUS")) == events.IDLE
+    assert events.parse_presence_state(private("PREGAME")) == events.PREGAME
+    assert events.parse_presence_state(private("INGAME")) == events.INGAME
+    assert events.parse_presence_state(private("INGAME", "ShootingRange")) == events.RANGE
+    assert events.parse_presence_state("not base64 json") is None
+
+
+def test_subscribes_and_reports_state_changes(feed, watcher):
+    conn, subscriptions = feed.accept()
+    assert subscriptions == [
+        [events.WAMP_SUBSCRIBE, events.PRESENCE_EVENT],
+        [events.WAMP_SUBSCRIBE, events.SESSION_EVENT],
+    ]
+    assert feed.auth == ["Basic " + base64.b64encode(b"riot:secret").decode()]
+    _wait(lambda: watcher.connected)
+
+    conn.send_text(_presence("PREGAME"))
+    conn.send_text(_presence("PREGAME"))
+    conn.send_text(_presence("INGAME", puuid="someone-else"))
+    conn.send_text(_presence("INGAME"))
+    conn.send_text(json.dumps([events.WAMP_EVENT, events.SESSION_EVENT, {"eventType": "Delete"}]))
+    _wait(lambda: len(watcher.changes) == 3)
+    assert watcher.changes == [events.PREGAME, events.INGAME, events.IDLE]
+    conn.close()
+
+
+def test_dropped_feed_falls_back_to_polling_and_reconnects(feed, watcher):
+    conn, _ = feed.accept()
+    _wait(lambda: watcher.connected)
+    conn.sock.close()
+    _wait(lambda: not watcher.connected)
+
+    conn, subscriptions = feed.accept()
+    assert len(subscriptions) == 2
+    _wait(lambda: watcher.connected)
+    conn.send_text(_presence("INGAME"))
+    _wait(lambda: watcher.changes == [events.INGAME])
+    conn.close()
+
+
+class _Watcher:
+    connected = True
+    state = events.INGAME
+
+
+def test_pipeline_stops_polling_while_feed_is_healthy(monkeypatch):
+    calls = []
+
+    async def fake_snapshot():
+        calls.append(1)
+        return models.MatchSnapshot(
+            match_id="m1", phase="core-game", details=models.MatchDetails("Competitive", "Ascent", "eu"),
+            loadouts={SELF: {}},
+        )
+
+    monkeypatch.setattr(login, "ensure_logged_in", lambda: None)
+    monkeypatch.setattr(live_match_async, "get_match_snapshot", fake_snapshot)
+    monkeypatch.setattr(pipeline.stats, "prefetch_match", lambda snapshot, puuids=None: None)
+    watcher = _Watcher()
+    match_pipeline = pipeline.MatchPipeline(watcher)
+
+    assert match_pipeline.cycle() == events.INGAME
+    assert match_pipeline.cycle() == events.INGAME
+    assert len(calls) == 1
+
+    watcher.connected = False
+    match_pipeline.cycle()
+    assert len(calls) == 2
+
+    watcher.connected = True
+    watcher.state = events.IDLE
+    assert match_pipeline.cycle() == events.IDLE
+    assert len(calls) == 2
+
+
+def _player(puuid, team):
+    return models.Player(puuid, team, models.IgnData(puuid), models.IdentityData("Jett"))
+
+
+def test_pipeline_prefetches_players_as_they_appear(monkeypatch):
+    rosters = [
+        ("m1", "pregame", [_player(SELF, "Blue"), _player("mate", "Blue")]),
+        ("m1", "core-game", [_player(SELF, "Blue"), _player("mate", "Blue"), _player("enemy", "Red")]),
+        ("m1", "core-game", [_player(SELF, "Blue"), _player("mate", "Blue"), _player("enemy", "Red")]),
+        ("m2", "pregame", [_player(SELF, "Red")]),
+    ]
+    prefetched = []
+
+    async def fake_snapshot():
+        match_id, phase, players = rosters.pop(0)
+        return models.MatchSnapshot(
+            match_id=match_id, phase=phase, details=models.MatchDetails("Competitive", "Ascent", "eu"),
+            blue=[p for p in players if p.team_id == "Blue"], red=[p for p in players if p.team_id == "Red"],
+        )
+
+    monkeypatch.setattr(login, "ensure_logged_in", lambda: None)
+    monkeypatch.setattr(live_match_async, "get_match_snapshot", fake_snapshot)
+    monkeypatch.setattr(pipeline.stats, "prefetch_match", lambda snapshot, puuids=None: prefetched.append(puuids))
+    match_pipeline = pipeline.MatchPipeline()
+    for _ in range(4):
+        match_pipeline.cycle()
+
+    assert prefetched == [{SELF, "mate"}, {"enemy"}, {SELF}]
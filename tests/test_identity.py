@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from valorip import identity, live_match
+
+
+class _Response:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def names(tmp_path, monkeypatch):
+    cache = identity.IdentityCache(tmp_path / "identities.db")
+    monkeypatch.setattr(identity, "_cache", cache)
+    calls = []
+
+    def pd(method, path, json=None):
+        calls.append(json)
+        if cache.down:
+            return _Response(None, 503)
+        return _Response([
+            {"Subject": puuid, "GameName": "" if puuid.startswith("hidden") else puuid, "TagLine": "EUW"}
+            for puuid in json
+        ])
+
+    monkeypatch.setattr(live_match.riot, "pd", pd)
+    cache.calls = calls
+    cache.down = False
+    return cache
+
+
+def test_known_names_are_not_requested_again(names):
+    assert live_match.fetch_names(["a", "b"]) == ({"a": "a#EUW", "b": "b#EUW"}, 1)
+    assert live_match.fetch_names(["a", "b"]) == ({"a": "a#EUW", "b": "b#EUW"}, 0)
+    assert names.calls == [["a", "b"]]
+
+
+def test_empty_name_is_cached_until_its_ttl_runs_out(names, monkeypatch):
+    assert live_match.fetch_names(["a", "hidden"]) == ({"a": "a#EUW"}, 1)
+    assert live_match.fetch_names(["a", "hidden"]) == ({"a": "a#EUW"}, 0)
+    assert names.calls == [["a", "hidden"]]
+    assert names.get("hidden") is None
+
+    # past the TTL the empty entry is re-checked in the background
+    monkeypatch.setattr(identity, "IDENTITY_TTL", -1)
+    live_match.fetch_names(["hidden"])
+    deadline = time.monotonic() + 5
+    while len(names.calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert names.calls[1:] == [["hidden"]]
+
+
+def test_parse_names_keeps_subjects_without_a_name():
+    name_map = live_match.parse_names([{"Subject": "hidden-puuid", "GameName": "", "TagLine": ""}])
+    assert name_map == {"hidden-puuid": ""}
+
+
+def test_failed_lookup_backs_off(names, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(identity.time, "time", lambda: now[0])
+    names.down = True
+    assert live_match.fetch_names(["a"]) == ({}, 1)
+    assert live_match.fetch_names(["a"]) == ({}, 0)
+    assert len(names.calls) == 1
+
+    now[0] += identity.RETRY_DELAY
+    live_match.fetch_names(["a"])
+    assert len(names.calls) == 2
+    # the second failure waits twice as long
+    now[0] += identity.RETRY_DELAY
+    live_match.fetch_names(["a"])
+    assert len(names.calls) == 2
+
+    names.down = False
+    now[0] += identity.RETRY_DELAY
+    assert live_match.fetch_names(["a"]) == ({"a": "a#EUW"}, 1)
+
+
+def test_failed_stale_refresh_backs_off(names, monkeypatch):
+    live_match.fetch_names(["a"])
+    monkeypatch.setattr(identity, "IDENTITY_TTL", -1)
+    names.down = True
+    assert live_match.fetch_names(["a"]) == ({"a": "a#EUW"}, 0)
+    deadline = time.monotonic() + 5
+    while names._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert live_match.fetch_names(["a"]) == ({"a": "a#EUW"}, 0)
+    time.sleep(0.05)
+    assert len(names.calls) == 2
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+import requests
+
+from valorip import constants, events, live_match, live_match_async, login, models, pipeline, scheduler
+
+SELF = "self-puuid"
+
+
+class _Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class _Routes(dict):
+    calls = None
+
+
+@pytest.fixture
+def glz(monkeypatch):
+    """Serve the player lookups from a {phase: response or exception} table."""
+    monkeypatch.setattr(constants, "PUUID", SELF)
+    routes, calls = _Routes(), []
+
+    def fake_glz(method, path, **kwargs):
+        phase = path.split("/")[1]
+        calls.append(phase)
+        result = routes.get(phase, _Response(404))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(live_match.riot, "glz", fake_glz)
+    routes.calls = calls
+    return routes
+
+
+def _detect():
+    return asyncio.run(live_match_async.detect_match())
+
+
+def test_in_game_tick_only_asks_core_game(glz):
+    glz["core-game"] = _Response(200, {"MatchID": "m1"})
+    glz["pregame"] = _Response(200, {"MatchID": "m0"})
+    assert _detect() == ("m1", "core-game", 1)
+    assert glz.calls == ["core-game"]
+
+
+def test_pregame_is_asked_after_core_game_404(glz):
+    glz["pregame"] = _Response(200, {"MatchID": "m1"})
+    assert _detect() == ("m1", "pregame", 2)
+    assert glz.calls == ["core-game", "pregame"]
+
+
+def test_no_match_anywhere_is_not_in_match(glz):
+    glz["core-game"] = _Response(200, {})
+    with pytest.raises(live_match.NotInMatchError):
+        _detect()
+
+
+@pytest.mark.parametrize("failure", [_Response(503), _Response(401), requests.ConnectionError("down")])
+def test_failed_lookup_is_an_error_not_menus(glz, failure):
+    glz["core-game"] = failure
+    with pytest.raises(Exception) as raised:
+        _detect()
+    assert not isinstance(raised.value, live_match.NotInMatchError)
+    assert glz.calls == ["core-game"]
+
+
+def test_sync_detection_classifies_like_async(glz):
+    glz["pregame"] = _Response(200, {"MatchID": "m1"})
+    assert live_match.detect_match_phase() == ("m1", "pregame", 2)
+    assert live_match.detect_match() == (True, "m1")
+
+    glz["core-game"] = _Response(429)
+    with pytest.raises(Exception) as raised:
+        live_match.detect_match_phase()
+    assert not isinstance(raised.value, live_match.NotInMatchError)
+
+    del glz["core-game"], glz["pregame"]
+    with pytest.raises(live_match.NotInMatchError):
+        live_match.detect_match()
+
+
+@pytest.mark.parametrize("failure", [_Response(503), requests.ConnectionError("down")])
+def test_outage_mid_match_keeps_the_snapshot_and_skips_idle_backoff(glz, monkeypatch, failure):
+    monkeypatch.setattr(login, "ensure_logged_in", lambda: None)
+    match_pipeline = pipeline.MatchPipeline()
+    snapshot = models.MatchSnapshot("m1", "core-game", models.MatchDetails("Competitive", "Ascent", "eu"))
+    match_pipeline._publish(snapshot, events.INGAME, None)
+    refresh = scheduler.RefreshScheduler(match_pipeline.cycle)
+    refresh.state = events.INGAME
+
+    glz["core-game"] = failure
+    refresh.run_once()
+
+    assert match_pipeline.error is not None
+    assert match_pipeline.snapshot is snapshot
+    assert refresh.state is None
+    assert refresh.interval == scheduler.INTERVALS[None]
+
+    del glz["core-game"]
+    refresh.run_once()
+    assert refresh.state == events.IDLE
+    assert match_pipeline.snapshot is None
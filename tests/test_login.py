@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from valorip import constants, login
+from valorip.client import riot
+
+
+class _Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def credentials(tmp_path, monkeypatch):
+    lockfile = tmp_path / "lockfile"
+    lockfile.write_text("Riot Client:1:50000:secret:https", encoding="utf-8")
+    manager = login.CredentialManager(lockfile, tmp_path / "session.json")
+    for name in ("ACCESS_TOKEN", "ENTITLEMENTS_TOKEN", "PUUID"):
+        monkeypatch.setattr(constants, name, getattr(constants, name))
+    monkeypatch.setattr(constants, "ACCESS_TOKEN", "token-0")
+    for name in ("local_port", "local_auth"):
+        monkeypatch.setattr(riot, name, getattr(riot, name))
+    monkeypatch.setattr(riot, "on_unauthorized", manager.refresh)
+    issued = []
+
+    def local(method, path, **kwargs):
+        # slow enough that concurrent 401s overlap
+        time.sleep(0.05)
+        issued.append(f"token-{len(issued) + 1}")
+        return _Response(200, {"accessToken": issued[-1], "token": "ent", "subject": "self-puuid"})
+
+    monkeypatch.setattr(riot, "local", local)
+    manager.issued = issued
+    return manager
+
+
+def test_concurrent_401s_share_one_refresh(credentials, monkeypatch):
+    def request(method, url, kind="external", headers=None, **kwargs):
+        return _Response(401 if headers["Authorization"] == "Bearer token-0" else 200)
+
+    monkeypatch.setattr(riot, "request", request)
+    results = []
+    workers = [
+        threading.Thread(target=lambda: results.append(riot.pd("GET", "/mmr/v1/players/x").status_code))
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert results == [200, 200, 200]
+    assert credentials.issued == ["token-1"]
+    assert constants.ACCESS_TOKEN == "token-1"
+
+
+def test_refresh_without_a_rejected_token_always_fetches(credentials):
+    credentials.refresh()
+    credentials.refresh()
+    assert credentials.issued == ["token-1", "token-2"]
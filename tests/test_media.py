@@ -0,0 +1,37 @@
+import itertools
+
+from valorip import media
+
+
+def test_eviction_drops_oldest_entries_and_their_objects(app_data, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(media.time, "time", lambda: next(clock))
+    cache = media.MediaCache(root=app_data / "media", cap=450)
+
+    blobs = [bytes([i]) * 100 for i in range(6)]
+    for i, blob in enumerate(blobs):
+        cache.put_derivative("src", f"t{i}", blob)
+        # a second entry for the same bytes keeps the object alive
+        if i == 0:
+            cache.put_derivative("src", "t0-copy", blob)
+
+    assert cache.size <= cache.cap
+    assert cache.size == sum(size for _, size in cache._conn.execute("SELECT hash, size FROM objects"))
+    kept = [i for i in range(6) if cache.get_derivative("src", f"t{i}") is not None]
+    assert kept == [2, 3, 4, 5]
+    assert cache.get_derivative("src", "t0-copy") is None
+    objects = [path for path in (app_data / "media" / "objects").rglob("*") if path.is_file()]
+    assert len(objects) == 4
+
+
+def test_object_file_lost_from_disk_is_written_again(app_data):
+    cache = media.MediaCache(root=app_data / "media")
+    cache.put_derivative("src", "t", b"pixels")
+    digest = cache._conn.execute("SELECT hash FROM derivatives").fetchone()[0]
+    cache._object_path(digest).unlink()
+    assert cache.get_derivative("src", "t") is None
+
+    size = cache.size
+    cache.put_derivative("src", "t", b"pixels")
+    assert cache.get_derivative("src", "t") == b"pixels"
+    assert cache.size == size
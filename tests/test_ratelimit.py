@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from valorip.ratelimit import RateLimitedError, TokenBucket
+
+
+def test_burst_up_to_capacity_then_refuses_to_wait_past_max_wait():
+    bucket = TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        bucket.acquire(max_wait=0)
+    with pytest.raises(RateLimitedError):
+        bucket.acquire(max_wait=0.1)
+
+
+def test_waits_for_a_refill_within_max_wait():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.acquire()
+    start = time.monotonic()
+    bucket.acquire(max_wait=1)
+    assert 0.005 < time.monotonic() - start < 0.5
+
+
+def test_429_blocks_for_retry_after():
+    bucket = TokenBucket(rate=100, capacity=10)
+    bucket.update_from_headers(429, {"Retry-After": "30"})
+    assert bucket.blocked
+    with pytest.raises(RateLimitedError):
+        bucket.acquire(max_wait=1)
+
+
+def test_quota_headers_cap_the_local_tokens():
+    bucket = TokenBucket(rate=0.001, capacity=10)
+    bucket.update_from_headers(200, {"x-ratelimit-remaining": "1", "x-ratelimit-reset": "20"})
+    assert not bucket.blocked
+    bucket.acquire(max_wait=0)
+    with pytest.raises(RateLimitedError):
+        bucket.acquire(max_wait=0)
+
+    bucket.update_from_headers(200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "20"})
+    assert bucket.blocked
@@ -0,0 +1,90 @@
+import gzip
+import json
+
+import pytest
+
+from valorip import constants, live_match, login, replay, stats, valapi
+from valorip.client import riot
+
+SELF = "self-puuid"
+
+
+def _exchange(method, url, status, content=""):
+    return {"t": 0, "method": method, "url": url, "body": None, "status": status, "reason": "",
+            "headers": {}, "content": content, "encoding": None, "elapsed": 0}
+
+
+def _write_log(path, region="na"):
+    records = [
+        {"format": replay.LOG_FORMAT, "session": 0},
+        _exchange("GET", "https://127.0.0.1:50000/entitlements/v1/token", 200,
+                  json.dumps({"accessToken": "redacted", "token": "redacted", "subject": SELF})),
+        {"region": region, "shard": region},
+        _exchange("GET", f"https://glz-{region}-1.{region}.a.pvp.net/core-game/v1/players/{SELF}", 404),
+        _exchange("GET", f"https://glz-{region}-1.{region}.a.pvp.net/pregame/v1/players/{SELF}", 404),
+    ]
+    with gzip.open(path, "wb") as f:
+        for record in records:
+            f.write(json.dumps(record).encode() + b"\n")
+
+
+@pytest.fixture
+def replaying(app_data, tmp_path, monkeypatch):
+    for name in ("ACCESS_TOKEN", "ENTITLEMENTS_TOKEN", "PUUID", "REGION", "SHARD"):
+        monkeypatch.setattr(constants, name, None)
+    monkeypatch.setattr(login.credentials, "lockfile_path", login.credentials.lockfile_path)
+    monkeypatch.setattr(login.credentials, "expires_at", None)
+    (app_data / "agents.json").write_text('{"status": 200, "data": []}', encoding="utf-8")
+    (app_data / "stats.db").write_bytes(b"live")
+    log = tmp_path / "session.log.gz"
+    _write_log(log)
+    yield log
+    riot.mount(None)
+
+
+def test_replay_runs_in_its_own_data_dir(replaying, app_data):
+    replay.start_replay(replaying, "fast")
+
+    assert constants.APP_DATA_DIR != app_data
+    assert valapi.load_cached("agents") == {"status": 200, "data": []}
+    assert stats.StatsStore().path.parent == constants.APP_DATA_DIR
+    assert (app_data / "stats.db").read_bytes() == b"live"
+    assert not (app_data / "replay_lockfile").exists()
+
+
+def test_replay_restores_the_recorded_region(replaying):
+    replay.start_replay(replaying, "fast")
+    login.ensure_logged_in()
+
+    assert (constants.REGION, constants.SHARD, constants.PUUID) == ("na", "na", SELF)
+    # both lookups hit the recorded na hosts, so this is a clean "not in match"
+    with pytest.raises(live_match.NotInMatchError):
+        live_match.detect_match_phase()
+
+
+def test_session_info_merges_header_records(replaying):
+    info = replay.session_info(replay.read_records(replaying))
+    assert info == {"format": replay.LOG_FORMAT, "session": 0, "region": "na", "shard": "na"}
+    assert len(replay.read_log(replaying)) == 3
+
+
+class _Message:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def test_recorder_notes_the_region_once_login_resolved_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "REGION", None)
+    recorder = replay.Recorder(tmp_path / "session.log.gz")
+    request = _Message(method="GET", url="https://glz-ap-1.ap.a.pvp.net/x", body=None)
+    response = _Message(status_code=404, reason="Not Found", headers={}, content=b"")
+    recorder.record(request, response, 0)
+    monkeypatch.setattr(constants, "REGION", "ap")
+    monkeypatch.setattr(constants, "SHARD", "ap")
+    recorder.record(request, response, 0)
+    recorder.record(request, response, 0)
+    recorder.close()
+
+    records = replay.read_records(tmp_path / "session.log.gz")
+    assert [record.get("region") for record in records if "method" not in record] == [None, "ap"]
+    assert replay.session_info(records)["shard"] == "ap"
@@ -0,0 +1,104 @@
+import pytest
+
+from valorip import riot_stats
+from valorip.ratelimit import RateLimitedError, TokenBucket
+
+PUUID = "self-puuid"
+
+
+class _Response:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+
+class _Routes(dict):
+    calls = None
+
+
+@pytest.fixture
+def pd(monkeypatch):
+    """Serve pd GETs from a {path: response} table; anything else is a 404."""
+    routes, calls = _Routes(), []
+
+    def fake_pd(method, path, **kwargs):
+        calls.append(path)
+        return routes.get(path, _Response(404))
+
+    monkeypatch.setattr(riot_stats.riot, "pd", fake_pd)
+    monkeypatch.setattr(riot_stats, "pd_limiter", TokenBucket(rate=1000, capacity=1000))
+    routes.calls = calls
+    return routes
+
+
+def _updates_path(start, end):
+    return (f"/mmr/v1/players/{PUUID}/competitiveupdates"
+            f"?startIndex={start}&endIndex={end}&queue=competitive")
+
+
+def _details(match_id, kills, deaths, hits):
+    return _Response(200, {
+        "matchInfo": {"gameStartMillis": 1_700_000_000_000},
+        "players": [{"subject": "other", "stats": {"kills": 99, "deaths": 0}},
+                    {"subject": PUUID, "stats": {"kills": kills, "deaths": deaths}}],
+        "roundResults": [
+            {"playerStats": [{"subject": PUUID, "damage": [hit]} for hit in hits]
+             + [{"subject": "other", "damage": [{"headshots": 50, "bodyshots": 0, "legshots": 0}]}]},
+        ],
+    })
+
+
+def test_mmr_stats(pd):
+    pd[f"/mmr/v1/players/{PUUID}"] = _Response(200, {
+        "LatestCompetitiveUpdate": {"TierAfterUpdate": 14, "RankedRatingAfterUpdate": 42, "SeasonID": "act2"},
+        "QueueSkills": {"competitive": {"SeasonalInfoBySeasonID": {
+            "act1": {"CompetitiveTier": 16, "WinsByTier": {"17": 1, "15": 3}, "NumberOfGames": 10, "NumberOfWins": 9},
+            "act2": {"CompetitiveTier": 14, "NumberOfGames": 8, "NumberOfWins": 3},
+        }}},
+    })
+    assert riot_stats.mmr_stats(PUUID) == {'rank': "Gold 3 (42 RR)", 'peak_rank': "Platinum 3", 'win_rate': 37.5}
+
+
+def test_unranked_player_and_missing_profile(pd):
+    pd[f"/mmr/v1/players/{PUUID}"] = _Response(200, {"LatestCompetitiveUpdate": {"TierAfterUpdate": 0}})
+    assert riot_stats.mmr_stats(PUUID) == {'rank': 'Unranked', 'peak_rank': 'Unranked'}
+    assert riot_stats.mmr_stats("nobody") == {}
+
+
+def test_match_ids_page_until_a_known_match(pd):
+    pd[_updates_path(0, 20)] = _Response(200, {"Matches": [{"MatchID": f"m{i}"} for i in range(20)]})
+    pd[_updates_path(20, 25)] = _Response(200, {"Matches": [{"MatchID": f"m{i}"} for i in range(20, 25)]})
+    assert riot_stats.recent_match_ids(PUUID, 25) == [f"m{i}" for i in range(25)]
+
+    pd.calls.clear()
+    assert riot_stats.recent_match_ids(PUUID, 25, known_ids={"m3"}) == ["m0", "m1", "m2"]
+    assert pd.calls == [_updates_path(0, 20)]
+
+
+def test_match_rows_sum_hits_for_the_player_only(pd):
+    pd[_updates_path(0, 2)] = _Response(200, {"Matches": [{"MatchID": "a"}, {"MatchID": "b"}]})
+    pd["/match-details/v1/matches/a"] = _details("a", 20, 10, [
+        {"headshots": 3, "bodyshots": 5, "legshots": 1}, {"headshots": 1, "bodyshots": 0, "legshots": 0},
+    ])
+    # "b" is missing upstream and is skipped rather than failing the batch
+    assert riot_stats.match_rows(PUUID, 2) == [{
+        'match_id': "a", 'started_at': 1_700_000_000, 'kills': 20, 'deaths': 10,
+        'headshots': 4, 'bodyshots': 5, 'legshots': 1,
+    }]
+
+
+def test_failed_first_page_is_a_failure(pd):
+    assert riot_stats.match_rows(PUUID, 5) is None
+
+
+def test_429_raises_and_blocks_the_limiter(pd):
+    pd[f"/mmr/v1/players/{PUUID}"] = _Response(429, headers={"Retry-After": "30"})
+    with pytest.raises(RateLimitedError):
+        riot_stats.mmr_stats(PUUID)
+    assert riot_stats.pd_limiter.blocked
+    with pytest.raises(RateLimitedError):
+        riot_stats._pd_json(f"/mmr/v1/players/{PUUID}", max_wait=0)
@@ -0,0 +1,79 @@
+import threading
+
+from valorip import scheduler
+from valorip.events import IDLE, INGAME, PREGAME
+
+
+def test_interval_follows_the_state():
+    states = iter([PREGAME, INGAME, None])
+    refresh = scheduler.RefreshScheduler(lambda: next(states))
+    for expected in (PREGAME, INGAME, None):
+        refresh.run_once()
+        assert refresh.interval == scheduler.INTERVALS[expected]
+
+
+def test_idle_backs_off_and_resets():
+    states = iter([IDLE] * 5 + [PREGAME, IDLE])
+    refresh = scheduler.RefreshScheduler(lambda: next(states))
+    intervals = []
+    for _ in range(7):
+        refresh.run_once()
+        intervals.append(refresh.interval)
+    assert intervals == [15, 30, 60, 60, 60, 2, 15]
+
+
+def test_failed_cycle_keeps_the_last_state():
+    def cycle():
+        raise RuntimeError("boom")
+
+    refresh = scheduler.RefreshScheduler(cycle)
+    refresh.state = INGAME
+    assert refresh.run_once()
+    assert refresh.state == INGAME
+    assert refresh.cycles == 1
+
+
+def test_only_one_cycle_in_flight():
+    entered, release = threading.Event(), threading.Event()
+    runs = []
+
+    def cycle():
+        runs.append(1)
+        entered.set()
+        release.wait(5)
+        return INGAME
+
+    refresh = scheduler.RefreshScheduler(cycle)
+    worker = threading.Thread(target=refresh.run_once)
+    worker.start()
+    entered.wait(5)
+    assert refresh.in_flight
+    assert refresh.run_once() is False
+    release.set()
+    worker.join()
+    assert runs == [1]
+    assert not refresh.in_flight
+
+
+def test_trigger_during_a_cycle_runs_another_right_after():
+    entered, release, second = threading.Event(), threading.Event(), threading.Event()
+    runs = []
+
+    def cycle():
+        runs.append(1)
+        if len(runs) == 1:
+            entered.set()
+            release.wait(5)
+        else:
+            second.set()
+        return IDLE
+
+    # the idle interval alone would not run a second cycle within the test
+    refresh = scheduler.RefreshScheduler(cycle, intervals={IDLE: 60}).start()
+    entered.wait(5)
+    refresh.trigger()
+    refresh.trigger()
+    release.set()
+    assert second.wait(5)
+    refresh.stop()
+    assert len(runs) == 2
@@ -0,0 +1,66 @@
+import json
+import urllib.request
+
+import pytest
+
+from valorip import constants, events, identity, models, pipeline, server, stats, ws
+
+SNAPSHOT = models.MatchSnapshot(
+    "m1", "core-game", models.MatchDetails("Competitive", "Ascent", "eu"),
+    blue=[models.Player("p1", "Blue", models.IgnData("One#EUW"), models.IdentityData("Jett"))],
+)
+
+
+class _Backend:
+    limiter = None
+
+    def mmr(self, puuid, username, tag):
+        return {'rank': 'Gold 1 (10 RR)', 'peak_rank': 'Gold 3', 'win_rate': 50.0}
+
+    def match_rows(self, puuid, username, tag, size, known_ids):
+        return []
+
+
+@pytest.fixture
+def snapshot_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(stats, "_store", stats.StatsStore(tmp_path / "stats.db"))
+    monkeypatch.setattr(stats, "_subscribers", [])
+    monkeypatch.setattr(identity, "_cache", identity.IdentityCache(tmp_path / "identities.db"))
+    monkeypatch.setattr(stats, "BACKENDS", {'fake': _Backend()})
+    monkeypatch.setattr(constants, "STATS_BACKEND", "fake")
+    match_pipeline = pipeline.MatchPipeline()
+    match_pipeline._publish(SNAPSHOT, events.INGAME, None)
+    snapshot_server = server.SnapshotServer(match_pipeline, port=0).start()
+    yield snapshot_server
+    snapshot_server.stop()
+
+
+def _get(snapshot_server, path):
+    host, port = snapshot_server.address
+    with urllib.request.urlopen(f"http://{host}:{port}{path}", timeout=5) as r:
+        return json.loads(r.read())
+
+
+def test_stored_stats_are_republished_without_a_new_cycle(snapshot_server):
+    state = _get(snapshot_server, "/api/state")
+    assert state['stats'] == {"p1": None}
+    host, port = snapshot_server.address
+    consumer = ws.connect(host, port, path="/ws", use_ssl=False)
+    assert json.loads(consumer.recv())['version'] == state['version']
+
+    stats.refresh("p1", "One", "EUW", ['mmr'])
+
+    state = _get(snapshot_server, "/api/state")
+    assert state['stats']["p1"]['rank'] == 'Gold 1 (10 RR)'
+    assert state['stats']["p1"] == _get(snapshot_server, "/api/stats/p1")
+    pushed = json.loads(consumer.recv())
+    assert pushed['version'] == state['version']
+    assert pushed['stats'] == state['stats']
+    consumer.close()
+
+
+def test_stats_for_players_not_in_the_match_change_nothing(snapshot_server):
+    version = _get(snapshot_server, "/api/state")['version']
+    stats.refresh("someone-else", "Two", "EUW", ['mmr'])
+    assert _get(snapshot_server, "/api/state")['version'] == version
+
@@ -0,0 +1,222 @@
+import threading
+import time
+
+import pytest
+
+from valorip import constants, identity, models, stats
+from valorip.ratelimit import RateLimitedError, TokenBucket
+
+
+class _Backend:
+    """Stats backend answering from canned values and counting calls."""
+
+    def __init__(self):
+        self.limiter = TokenBucket(rate=1000, capacity=1000)
+        self.mmr_values = {'rank': 'Gold 1 (10 RR)', 'peak_rank': 'Gold 3', 'win_rate': 50.0}
+        self.rows = []
+        self.calls = []
+        self.delay = 0
+        self.error = None
+
+    def mmr(self, puuid, username, tag):
+        self.calls.append(('mmr', puuid))
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return dict(self.mmr_values)
+
+    def match_rows(self, puuid, username, tag, size, known_ids):
+        self.calls.append(('history', puuid, size))
+        if self.error:
+            raise self.error
+        return [row for row in self.rows if row['match_id'] not in known_ids][:size]
+
+
+def _row(i, kills=10, deaths=5, headshots=2, bodyshots=6, legshots=2):
+    return {'match_id': f"m{i}", 'started_at': i, 'kills': kills, 'deaths': deaths,
+            'headshots': headshots, 'bodyshots': bodyshots, 'legshots': legshots}
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    fake = _Backend()
+    monkeypatch.setattr(stats, "_store", stats.StatsStore(tmp_path / "stats.db"))
+    monkeypatch.setattr(identity, "_cache", identity.IdentityCache(tmp_path / "identities.db"))
+    monkeypatch.setattr(stats, "BACKENDS", {'fake': fake})
+    monkeypatch.setattr(constants, "STATS_BACKEND", "fake")
+    return fake
+
+
+def _expire(puuid, fields):
+    store = stats.get_store()
+    with store._lock:
+        store._conn.executemany(
+            "UPDATE player_stats SET fetched_at = 0 WHERE puuid = ? AND field = ?",
+            [(puuid, field) for field in fields],
+        )
+        store._conn.commit()
+
+
+def test_fields_go_stale_per_source(backend):
+    store = stats.get_store()
+    assert store.get("p") == ({}, set(stats.SOURCES))
+
+    store.put("p", {'rank': 'Gold 1', 'peak_rank': 'Gold 3', 'win_rate': 50.0, 'kd': 1.2, 'hs_rate': 20.0})
+    values, stale = store.get("p")
+    assert values['kd'] == 1.2 and stale == set()
+
+    _expire("p", ['rank'])
+    assert store.get("p")[1] == {'mmr'}
+
+
+def test_first_lookup_fetches_then_serves_from_cache(backend):
+    backend.rows = [_row(1)]
+    first = stats.get_stats("p", "Name", "TAG")
+    assert first['rank'] == 'Gold 1 (10 RR)' and first['kd'] == 2.0
+    calls = len(backend.calls)
+
+    assert stats.get_stats("p", "Name", "TAG") == first
+    assert len(backend.calls) == calls
+
+
+def test_stale_fields_are_served_then_refreshed_in_background(backend):
+    stats.get_stats("p", "Name", "TAG")
+    _expire("p", stats.SOURCES['mmr'])
+    backend.mmr_values['rank'] = 'Gold 2 (5 RR)'
+    backend.calls.clear()
+    updated = threading.Event()
+    result = {}
+
+    def on_update(new_stats):
+        result.update(new_stats)
+        updated.set()
+
+    assert stats.get_stats("p", "Name", "TAG", on_update)['rank'] == 'Gold 1 (10 RR)'
+    assert updated.wait(5)
+    assert result['rank'] == 'Gold 2 (5 RR)'
+    # only the stale source was fetched again
+    assert backend.calls == [('mmr', 'p')]
+
+
+def test_failed_background_refresh_is_logged(backend, capsys):
+    stats.get_stats("p", "Name", "TAG")
+    _expire("p", stats.SOURCES['mmr'])
+    backend.error = ValueError("upstream broke")
+
+    assert stats.get_stats("p", "Name", "TAG")['rank'] == 'Gold 1 (10 RR)'
+    deadline = time.monotonic() + 5
+    while "[!] Stats refresh for Name failed: upstream broke" not in capsys.readouterr().out:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_concurrent_lookups_share_one_fetch(backend):
+    backend.delay = 0.1
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(stats.get_stats("p", "Name", "TAG")))
+               for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [call for call in backend.calls if call[0] == 'mmr'] == [('mmr', 'p')]
+    assert all(result['rank'] == 'Gold 1 (10 RR)' for result in results)
+
+
+def test_totals_cover_exactly_the_newest_rows(backend):
+    store = stats.get_store()
+    rows = [_row(i, kills=i, deaths=1, headshots=i % 3) for i in range(12)]
+    store.add_match_rows("p", rows[6:], keep=5)
+    store.add_match_rows("p", rows[:6] + rows[10:], keep=5)
+
+    kept = rows[7:]
+    assert store.recent_match_ids("p") == {row['match_id'] for row in kept}
+    totals = store.totals("p")
+    assert totals['matches'] == 5
+    for field in stats.ROW_FIELDS:
+        assert totals[field] == sum(row[field] for row in kept)
+
+
+def test_rolling_stats_read_the_totals_and_short_windows_re_sum(backend):
+    store = stats.get_store()
+    store.add_match_rows("p", [_row(1, kills=1, deaths=1), _row(2, kills=4, deaths=2), _row(3, kills=9, deaths=3),
+                               _row(4, kills=6, deaths=2)], keep=3)
+
+    assert stats.get_rolling_stats("p") == {'kd': 2.71, 'hs_rate': 20.0}
+    assert stats.get_rolling_stats("p", window=1)['kd'] == 3.0
+    assert stats.get_rolling_stats("nobody") == {}
+
+
+def test_history_sync_only_asks_for_new_matches(backend):
+    backend.rows = [_row(i) for i in range(30, 0, -1)]
+    assert stats.sync_history("p", "Name", "TAG")
+    assert backend.calls[-1] == ('history', 'p', stats.HISTORY_DEPTH)
+
+    backend.rows.insert(0, _row(31))
+    backend.calls.clear()
+    assert stats.sync_history("p", "Name", "TAG")
+    assert backend.calls == [('history', 'p', stats.INCREMENTAL_SIZE)]
+    assert "m31" in stats.get_store().recent_match_ids("p")
+
+
+def test_history_sync_backfills_when_every_recent_match_is_new(backend):
+    backend.rows = [_row(1)]
+    stats.sync_history("p", "Name", "TAG")
+    backend.rows = [_row(i) for i in range(40, 1, -1)] + backend.rows
+    backend.calls.clear()
+
+    stats.sync_history("p", "Name", "TAG")
+    assert backend.calls == [('history', 'p', stats.INCREMENTAL_SIZE), ('history', 'p', stats.HISTORY_DEPTH)]
+    assert stats.get_store().totals("p")['matches'] == 40
+
+
+def test_failed_history_sync_keeps_stored_rows(backend):
+    backend.rows = [_row(1)]
+    stats.sync_history("p", "Name", "TAG")
+    backend.match_rows = lambda *args: None
+    assert not stats.sync_history("p", "Name", "TAG")
+    assert stats.fetch_source('history', "p", "Name", "TAG") == {}
+    assert stats.get_store().totals("p")['matches'] == 1
+
+
+def _snapshot(*players):
+    blue = [models.Player(puuid, "Blue", models.IgnData(f"{puuid}#TAG"), models.IdentityData("Jett"))
+            for puuid, team in players if team == "Blue"]
+    red = [models.Player(puuid, "Red", models.IgnData(f"{puuid}#TAG"), models.IdentityData("Jett"))
+           for puuid, team in players if team == "Red"]
+    return models.MatchSnapshot("m1", "core-game", models.MatchDetails("Competitive", "Ascent", "eu"), blue, red)
+
+
+def _prefetch(snapshot, **kwargs):
+    for thread in stats.prefetch_match(snapshot, **kwargs) or []:
+        thread.join()
+
+
+def test_prefetch_goes_enemies_first_and_skips_fresh_players(backend, monkeypatch):
+    monkeypatch.setattr(constants, "PUUID", "self")
+    snapshot = _snapshot(("self", "Blue"), ("mate", "Blue"), ("fresh", "Blue"), ("foe1", "Red"), ("foe2", "Red"))
+    stats.get_stats("fresh", "fresh", "TAG")
+    backend.calls.clear()
+
+    _prefetch(snapshot, workers=1)
+    assert [call[1] for call in backend.calls if call[0] == 'mmr'] == ["foe1", "foe2", "mate", "self"]
+    assert stats.prefetch_match(snapshot) is None
+
+
+def test_prefetch_only_queues_the_given_players(backend):
+    _prefetch(_snapshot(("a", "Blue"), ("b", "Red")), puuids={"b"})
+    assert {call[1] for call in backend.calls} == {"b"}
+
+
+def test_prefetch_stops_when_the_quota_runs_out(backend, capsys):
+    backend.error = RateLimitedError("quota")
+    _prefetch(_snapshot(*[(f"p{i}", "Red") for i in range(6)]), workers=2)
+    assert len([call for call in backend.calls if call[0] == 'mmr']) <= 2
+    assert "[!] Stats prefetch stopped: quota" in capsys.readouterr().out
+
+
+def test_prefetch_does_not_start_while_blocked(backend):
+    backend.limiter.block(60)
+    _prefetch(_snapshot(("a", "Red"), ("b", "Red")))
+    assert backend.calls == []
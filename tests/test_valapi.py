@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+from valorip import constants, valapi
+
+SKINS = {"status": 200, "data": [{"uuid": "a", "displayName": "Prime Vandal"}]}
+SKINS_V2 = {"status": 200, "data": [{"uuid": "b", "displayName": "Reaver Vandal"}]}
+
+
+@pytest.fixture
+def api(app_data, stand_in, monkeypatch):
+    monkeypatch.setattr(valapi, "API_BASE", stand_in.url + "/v1")
+    # refreshes adopt the served client version
+    monkeypatch.setattr(constants, "VERSION", constants.VERSION)
+    return stand_in
+
+
+def _sent_etag(api):
+    return api.requests[-1][1].get("If-None-Match")
+
+
+def test_conditional_get_reuses_cache_on_304(api):
+    api.set("/v1/weapons/skins", SKINS, etag='"v1"')
+
+    assert valapi.fetch_and_cache("weapon_skins", "weapons/skins") == SKINS
+    assert valapi.load_manifest()["datasets"]["weapon_skins"]["etag"] == '"v1"'
+
+    assert valapi.fetch_and_cache("weapon_skins", "weapons/skins", conditional=True) is None
+    assert _sent_etag(api) == '"v1"'
+    assert valapi.load_cached("weapon_skins") == SKINS
+
+
+def test_changed_etag_rewrites_dataset(api):
+    api.set("/v1/weapons/skins", SKINS, etag='"v1"')
+    valapi.fetch_and_cache("weapon_skins", "weapons/skins")
+
+    api.set("/v1/weapons/skins", SKINS_V2, etag='"v2"')
+    assert valapi.fetch_and_cache("weapon_skins", "weapons/skins", conditional=True) == SKINS_V2
+    assert _sent_etag(api) == '"v1"'
+    assert valapi.load_cached("weapon_skins") == SKINS_V2
+    assert valapi.load_manifest()["datasets"]["weapon_skins"]["etag"] == '"v2"'
+
+
+def test_conditional_get_without_cache_file_is_unconditional(api):
+    api.set("/v1/weapons/skins", SKINS, etag='"v1"')
+    valapi.fetch_and_cache("weapon_skins", "weapons/skins")
+    valapi._cache_path("weapon_skins").unlink()
+
+    assert valapi.fetch_and_cache("weapon_skins", "weapons/skins", conditional=True) == SKINS
+    assert _sent_etag(api) is None
+
+
+def test_corrupt_cache_file_is_refetched(api):
+    for name, endpoint in valapi.DATASETS.items():
+        api.set(f"/v1/{endpoint}", {"status": 200, "data": [{"uuid": name}]}, etag=f'"{name}"')
+    valapi.ensure_static_data()
+    assert len(api.requests) == len(valapi.DATASETS)
+
+    valapi._cache_path("agents").write_text('{"status": 200, "da', encoding="utf-8")
+    valapi.ensure_static_data()
+
+    assert [path for path, _ in api.requests[len(valapi.DATASETS):]] == ["/v1/agents"]
+    assert valapi.load_cached("agents") == {"status": 200, "data": [{"uuid": "agents"}]}
+
+
+def test_interrupted_write_keeps_previous_file(api, monkeypatch):
+    api.set("/v1/weapons/skins", SKINS, etag='"v1"')
+    valapi.fetch_and_cache("weapon_skins", "weapons/skins")
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    api.set("/v1/weapons/skins", SKINS_V2, etag='"v2"')
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "replace", crash)
+        with pytest.raises(OSError):
+            valapi.fetch_and_cache("weapon_skins", "weapons/skins", conditional=True)
+
+    assert valapi.load_cached("weapon_skins") == SKINS
+    # the validators still describe the file on disk, so the next refresh retries
+    assert valapi.load_manifest()["datasets"]["weapon_skins"]["etag"] == '"v1"'
+
+
+def test_refresh_costs_one_request_when_version_is_current(api):
+    api.set("/v1/version", {"data": {"manifestId": "M1", "version": "10.09", "riotClientVersion": "release-10.09"}})
+    for name, endpoint in valapi.DATASETS.items():
+        api.set(f"/v1/{endpoint}", {"status": 200, "data": []}, etag=f'"{name}"')
+
+    assert sorted(valapi.refresh_static_data()) == sorted(valapi.DATASETS)
+    assert valapi.load_manifest()["version"] == "M1"
+
+    before = len(api.requests)
+    assert valapi.refresh_static_data() == []
+    assert [path for path, _ in api.requests[before:]] == ["/v1/version"]
+
+
+def test_new_version_revalidates_and_only_downloads_changes(api):
+    api.set("/v1/version", {"data": {"manifestId": "M1"}})
+    for name, endpoint in valapi.DATASETS.items():
+        api.set(f"/v1/{endpoint}", {"status": 200, "data": []}, etag=f'"{name}"')
+    valapi.refresh_static_data()
+
+    api.set("/v1/version", {"data": {"manifestId": "M2"}})
+    api.set("/v1/agents", {"status": 200, "data": [{"uuid": "new"}]}, etag='"agents-2"')
+    assert valapi.refresh_static_data() == ["agents"]
+    assert json.loads(valapi._cache_path("agents").read_text(encoding="utf-8"))["data"] == [{"uuid": "new"}]
+    assert valapi.load_manifest()["version"] == "M2"
@@ -0,0 +1,164 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from valorip import ws
+
+
+@pytest.fixture
+def pair():
+    client, server = socket.socketpair()
+    yield ws.WebSocket(client, is_client=True), ws.WebSocket(server, is_client=False)
+    client.close()
+    server.close()
+
+
+@pytest.mark.parametrize("size", [0, 5, 125, 126, 65535, 65536])
+@pytest.mark.parametrize("mask", [True, False])
+def test_frame_round_trip(size, mask):
+    a, b = socket.socketpair()
+    payload = bytes(i % 251 for i in range(size))
+    writer = threading.Thread(target=ws.write_frame, args=(a, ws.OP_BINARY, payload, mask))
+    writer.start()
+    fin, opcode, received = ws.read_frame(b)
+    writer.join()
+    a.close()
+    b.close()
+    assert (fin, opcode, received) == (True, ws.OP_BINARY, payload)
+
+
+def test_masked_frame_is_not_plaintext_on_the_wire():
+    a, b = socket.socketpair()
+    ws.write_frame(a, ws.OP_TEXT, b"hello", mask=True)
+    raw = b.recv(64)
+    a.close()
+    b.close()
+    assert raw[1] & 0x80
+    assert b"hello" not in raw
+
+
+def test_text_messages_both_ways(pair):
+    client, server = pair
+    client.send_text("from client")
+    assert server.recv() == "from client"
+    server.send_text(json.dumps({"ü": 1}))
+    assert json.loads(client.recv()) == {"ü": 1}
+
+
+def test_fragmented_message_is_reassembled(pair):
+    client, server = pair
+    server.sock.sendall(bytes([ws.OP_TEXT, 3]) + b"abc")
+    server.sock.sendall(bytes([0x80 | ws.OP_CONT, 3]) + b"def")
+    assert client.recv() == "abcdef"
+
+
+def test_ping_is_answered_with_pong(pair):
+    client, server = pair
+    ws.write_frame(server.sock, ws.OP_PING, b"beat")
+    server.send_text("after ping")
+    assert client.recv() == "after ping"
+    # the client's pong is masked, as client frames must be
+    fin, opcode, payload = ws.read_frame(server.sock)
+    assert (opcode, payload) == (ws.OP_PONG, b"beat")
+
+
+def test_close_frame_ends_recv_and_is_echoed(pair):
+    client, server = pair
+    ws.write_frame(server.sock, ws.OP_CLOSE)
+    assert client.recv() is None
+    assert client.closed
+    assert ws.read_frame(server.sock)[1] == ws.OP_CLOSE
+
+
+def test_dropped_connection_ends_recv(pair):
+    client, server = pair
+    server.sock.close()
+    assert client.recv() is None
+    assert client.closed
+
+
+def _serve_handshake(listener, accept=True):
+    conn, _ = listener.accept()
+    request = b""
+    while b"\r\n\r\n" not in request:
+        request += conn.recv(1024)
+    headers = dict(
+        line.split(": ", 1) for line in request.decode().split("\r\n")[1:] if ": " in line
+    )
+    if not accept:
+        conn.sendall(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+        conn.close()
+        return None
+    conn.sendall(
+        b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        + f"Sec-WebSocket-Accept: {ws.accept_key(headers['Sec-WebSocket-Key'])}\r\n\r\n".encode()
+    )
+    return ws.WebSocket(conn, is_client=False), headers
+
+
+def test_connect_handshake_and_echo():
+    listener = socket.create_server(("127.0.0.1", 0))
+    result = {}
+
+    def serve():
+        server, result["headers"] = _serve_handshake(listener)
+        server.send_text(server.recv().upper())
+        server.close()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    client = ws.connect("127.0.0.1", listener.getsockname()[1], headers={"Authorization": "Basic x"}, use_ssl=False)
+    client.send_text("echo")
+    assert client.recv() == "ECHO"
+    assert client.recv() is None
+    thread.join()
+    listener.close()
+    assert result["headers"]["Authorization"] == "Basic x"
+
+
+def test_connect_rejected_handshake():
+    listener = socket.create_server(("127.0.0.1", 0))
+    thread = threading.Thread(target=_serve_handshake, args=(listener, False))
+    thread.start()
+    with pytest.raises(ws.WebSocketClosed):
+        ws.connect("127.0.0.1", listener.getsockname()[1], use_ssl=False)
+    thread.join()
+    listener.close()
+
+
+def test_pongs_do_not_interleave_with_concurrent_sends(pair):
+    client, server = pair
+    texts = [chr(ord("a") + i) * 1_000_000 for i in range(10)]
+    sent = threading.Event()
+    # an interleaved frame garbles the stream; fail instead of hanging on it
+    client.sock.settimeout(5)
+    server.sock.settimeout(5)
+
+    def ping():
+        while not sent.is_set():
+            ws.write_frame(client.sock, ws.OP_PING, b"p", mask=True)
+        ws.write_frame(client.sock, ws.OP_CLOSE, mask=True)
+
+    def send():
+        for text in texts:
+            server.send_text(text)
+        sent.set()
+
+    # the server's reader answers the pings while another thread broadcasts
+    threads = [
+        threading.Thread(target=target, daemon=True) for target in (server.recv, send, ping)
+    ]
+    for thread in threads:
+        thread.start()
+    received = []
+    while len(received) < len(texts):
+        fin, opcode, payload = ws.read_frame(client.sock)
+        if opcode == ws.OP_TEXT:
+            received.append(payload.decode())
+    assert received == texts
+    while opcode != ws.OP_CLOSE:
+        fin, opcode, payload = ws.read_frame(client.sock)
+    for thread in threads:
+        thread.join()
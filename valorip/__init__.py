@@ -1 +1 @@
-from . import login, live_match, constants, models
\ No newline at end of file
+from . import login, live_match, constants, models, content
\ No newline at end of file
@@ -0,0 +1,158 @@
+import json
+import mmap
+import os
+import struct
+import threading
+
+from PIL import Image, ImageTk
+
+from . import constants, media
+
+# every agent icon and rank badge, pre-rendered at card size into one file:
+# magic, u32 index length, JSON index {key: [offset, width, height]}, then
+# raw RGBA pixels, so an icon is a slice of the mapped file
+ATLAS_MAGIC = b"VRATLAS1"
+_HEADER = struct.Struct("<8sI")
+
+
+def _atlas_path():
+    return constants.APP_DATA_DIR / "icons.atlas"
+
+
+def build(items, version=None, path=None):
+    """Render {key: (url, max_size, circle)} into an atlas file.
+
+    Icons that fail to load are left out; cards fall back to loading them
+    on demand. Returns the number of icons written.
+    """
+    path = path or _atlas_path()
+    index, chunks, offset = {}, [], 0
+    for key, (url, max_size, circle) in items.items():
+        try:
+            img = media.load_rendered(url, max_size, circle).convert("RGBA")
+        except Exception as e:
+            print(f"[!] Atlas: skipping {key}: {e}")
+            continue
+        pixels = img.tobytes()
+        index[key] = [offset, img.width, img.height]
+        chunks.append(pixels)
+        offset += len(pixels)
+
+    _write(path, {"version": version, "keys": sorted(items), "icons": index}, chunks)
+    return len(index)
+
+
+def _write(path, header, chunks):
+    header = json.dumps(header).encode()
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(ATLAS_MAGIC, len(header)))
+        f.write(header)
+        for pixels in chunks:
+            f.write(pixels)
+    os.replace(tmp_path, path)
+
+
+class IconAtlas:
+    """Memory-mapped view of an atlas file; icons are sliced out on demand."""
+
+    def __init__(self, path=None):
+        self.path = path = path or _atlas_path()
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = _HEADER.unpack_from(self._map, 0)
+        if magic != ATLAS_MAGIC:
+            raise ValueError(f"{path} is not an icon atlas")
+        header = json.loads(self._map[_HEADER.size:_HEADER.size + header_len])
+        self.version = header.get("version")
+        self.keys = set(header.get("keys", ()))
+        self.icons = header.get("icons", {})
+        self._data_start = _HEADER.size + header_len
+        self._photos = {}
+        # guards the map: close() can run on another thread while icons are read
+        self._lock = threading.RLock()
+
+    def covers(self, keys, version):
+        """True if the atlas was built for this content version and key set."""
+        return self.version == version and self.keys.issuperset(keys)
+
+    def __contains__(self, key):
+        return key in self.icons
+
+    def image(self, key):
+        """The icon as a PIL image; KeyError if it is missing or the atlas was closed."""
+        with self._lock:
+            offset, width, height = self.icons[key]
+            start = self._data_start + offset
+            pixels = self._map[start:start + width * height * 4]
+        return Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+    def photo(self, key):
+        """PhotoImage for an icon, created once per key; None if it is not in the atlas."""
+        with self._lock:
+            photo = self._photos.get(key)
+            if photo is None and key in self.icons:
+                photo = self._photos[key] = ImageTk.PhotoImage(self.image(key))
+            return photo
+
+    def pixels(self):
+        """Every icon's pixels, in file order."""
+        with self._lock:
+            return self._map[self._data_start:]
+
+    def close(self):
+        with self._lock:
+            self.icons = {}
+            self._map.close()
+
+
+_atlas = None
+_atlas_lock = threading.Lock()
+
+
+def get_atlas():
+    """The mapped atlas, or None if none has been built yet."""
+    with _atlas_lock:
+        return _atlas
+
+
+def _swap(atlas):
+    """Make `atlas` the module atlas and close the one it replaces."""
+    global _atlas
+    with _atlas_lock:
+        old, _atlas = _atlas, atlas
+    if old is not None and old is not atlas:
+        old.close()
+
+
+def load(path=None):
+    path = path or _atlas_path()
+    try:
+        atlas = IconAtlas(path)
+    except (OSError, ValueError) as e:
+        if path.exists():
+            print(f"[!] Failed to map icon atlas: {e}")
+        return None
+    _swap(atlas)
+    return atlas
+
+
+def ensure(items, version=None, path=None):
+    """Map the atlas, rebuilding it first if it is missing or out of date."""
+    path = path or _atlas_path()
+    atlas = load(path)
+    if atlas and atlas.version is None and version is not None and atlas.covers(items, None):
+        # built before the content version was known: stamp it rather than re-render
+        header = {"version": version, "keys": sorted(atlas.keys), "icons": atlas.icons}
+        pixels = atlas.pixels()
+        _swap(None)
+        _write(path, header, [pixels])
+        return load(path)
+    if atlas and atlas.covers(items, version):
+        return atlas
+    # unmap before the rebuild replaces the file (Windows refuses otherwise)
+    _swap(None)
+    print(f"[*] Building icon atlas ({len(items)} icons)...")
+    count = build(items, version, path)
+    print(f"[+] Icon atlas ready: {count} icons")
+    return load(path)
@@ -0,0 +1,159 @@
+import base64
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import constants, metrics
+
+requests.packages.urllib3.disable_warnings()
+
+# (connect, read) timeouts per kind of host
+TIMEOUTS = {
+    "local": (2, 5),
+    "riot": (3.05, 10),
+    "external": (5, 30),
+}
+POOL_SIZE = 10
+
+
+class RiotClient:
+    """Shared HTTP client: one keep-alive session per host, fixed timeouts.
+
+    glz/pd calls get the Riot auth headers, local calls the lockfile basic
+    auth; anything else (Henrik, valorant-api, media) just gets pooling.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.local_port = None
+        self.local_auth = None
+        self.request_count = 0
+        # called once on a 401 from glz/pd with the access token the request
+        # carried; returns True if tokens were refreshed
+        self.on_unauthorized = None
+        # optional url -> url hook, e.g. to point every upstream at local stand-ins
+        self.url_rewriter = None
+        # optional () -> transport adapter, e.g. to record or replay a session
+        self.adapter_factory = None
+
+    def session(self, host):
+        with self._lock:
+            sess = self._sessions.get(host)
+            if sess is None:
+                sess = requests.Session()
+                if self.adapter_factory:
+                    adapter = self.adapter_factory()
+                else:
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                self._sessions[host] = sess
+            return sess
+
+    def mount(self, adapter_factory):
+        """Send every later request through adapters from adapter_factory."""
+        with self._lock:
+            self.adapter_factory = adapter_factory
+            sessions, self._sessions = self._sessions, {}
+        for sess in sessions.values():
+            sess.close()
+
+    @property
+    def region(self):
+        reg = getattr(constants, "REGION", None)
+        if not reg or reg == "none":
+            reg = getattr(constants, "SHARD", None)
+        if not reg or reg == "none":
+            reg = "eu"
+        return reg.lower()
+
+    @property
+    def glz_base(self):
+        return f"https://glz-{constants.SHARD}-1.{self.region}.a.pvp.net"
+
+    @property
+    def pd_base(self):
+        return f"https://pd.{self.region}.a.pvp.net"
+
+    @property
+    def local_base(self):
+        return f"https://127.0.0.1:{self.local_port}"
+
+    def headers(self):
+        """Build standard headers for Riot API requests."""
+        return {
+            "Authorization": f"Bearer {constants.ACCESS_TOKEN}",
+            "X-Riot-Entitlements-JWT": constants.ENTITLEMENTS_TOKEN,
+            "X-Riot-ClientPlatform": constants.PLATFORM,
+            "X-Riot-ClientVersion": constants.VERSION,
+        }
+
+    def set_local(self, port, password):
+        self.local_port = port
+        self.local_auth = base64.b64encode(f"riot:{password}".encode()).decode()
+
+    def request(self, method, url, kind="external", headers=None, **kwargs):
+        if self.url_rewriter:
+            url = self.url_rewriter(url)
+        host = urlsplit(url).netloc
+        kwargs.setdefault("timeout", TIMEOUTS[kind])
+        if kind != "external":
+            kwargs.setdefault("verify", False)
+        with self._lock:
+            self.request_count += 1
+        start = time.perf_counter()
+        try:
+            r = self.session(host).request(method, url, headers=headers, **kwargs)
+        except Exception:
+            metrics.observe_request(method, url, "error", time.perf_counter() - start, 0)
+            raise
+        metrics.observe_request(method, url, r.status_code, time.perf_counter() - start, len(r.content))
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def riot_request(self, method, url, **kwargs):
+        """Authenticated glz/pd request, retried exactly once after a token refresh on 401."""
+        headers = self.headers()
+        r = self.request(method, url, kind="riot", headers=headers, **kwargs)
+        if r.status_code == 401 and self.on_unauthorized:
+            try:
+                refreshed = self.on_unauthorized(headers["Authorization"].removeprefix("Bearer "))
+            except Exception as e:
+                print(f"[!] Token refresh failed: {e}")
+                refreshed = False
+            if refreshed:
+                r = self.request(method, url, kind="riot", headers=self.headers(), **kwargs)
+        return r
+
+    def glz(self, method, path, **kwargs):
+        return self.riot_request(method, self.glz_base + path, **kwargs)
+
+    def pd(self, method, path, **kwargs):
+        return self.riot_request(method, self.pd_base + path, **kwargs)
+
+    def local(self, method, path, **kwargs):
+        headers = {"Authorization": f"Basic {self.local_auth}"}
+        return self.request(method, self.local_base + path, kind="local", headers=headers, **kwargs)
+
+    def warm_up(self):
+        """Open TCP/TLS connections to the glz and pd hosts in the background."""
+        def connect(base):
+            if self.url_rewriter:
+                base = self.url_rewriter(base)
+            try:
+                # any answer (usually 404) leaves a live connection in the pool
+                self.session(urlsplit(base).netloc).head(base, timeout=TIMEOUTS["riot"], verify=False)
+            except Exception as e:
+                print(f"[!] Warm-up of {base} failed: {e}")
+
+        for base in (self.glz_base, self.pd_base):
+            threading.Thread(target=connect, args=(base,), daemon=True).start()
+
+
+riot = RiotClient()
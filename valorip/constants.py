@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 APP_NAME = "Valoripper"
@@ -16,3 +17,13 @@ PLATFORM = (
     'ew0KCSJwbGF0Zm9ybVR5cGUiOiAiUEMiLA0KCSJwbGF0Zm9ybU9TIjogIldpbmRvd3MiLA0KCSJwbGF0Zm9ybU9TVmVyc2lvbiI6ICIxMC4wLjE5MDQzLjEiLA0KCSJjbGllbnRWZXJzaW9uIjogIjEuMC4wLjAiDQp9'
 )
 VERSION = "release-10.09-shipping-15-1129237"
+
+# where player stats come from: "henrik" (Henrik's API, by Riot ID) or
+# "riot" (Riot's own pd endpoints, by PUUID; works for hidden names too)
+STATS_BACKEND = "henrik"
+
+# record every HTTP exchange of a session to a log, or replay such a log
+# instead of going online ("recorded" keeps the session's timing, "fast" doesn't)
+RECORD_PATH = os.environ.get("VALORIPPER_RECORD")
+REPLAY_PATH = os.environ.get("VALORIPPER_REPLAY")
+REPLAY_SPEED = os.environ.get("VALORIPPER_REPLAY_SPEED", "recorded")
@@ -0,0 +1,234 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics, snapshot, valapi
+
+# unknown skin ids remembered so repeated misses skip the prefix search
+NEGATIVE_CACHE_SIZE = 512
+# an empty catalog (datasets could not be fetched) is rebuilt after this long
+EMPTY_RETRY_INTERVAL = 30
+
+_catalog = None
+_catalog_built = 0.0
+_catalog_lock = threading.Lock()
+
+
+def _load_dataset(name):
+    """Load a dataset from cache, fetching it if it is missing."""
+    data = valapi.load_cached(name)
+    if not data:
+        try:
+            data = valapi.fetch_and_cache(name, valapi.DATASETS[name])
+        except Exception as e:
+            print(f"[!] Failed to fetch {name}: {e}")
+            return []
+    if data and data.get("status") == 200:
+        return data.get("data", [])
+    return []
+
+
+class ContentCatalog:
+    """UUID-indexed view over the static valorant-api content.
+
+    Only the resolved fields Valoripper reads are kept, so the same catalog
+    can be rebuilt from the raw JSON or from the compiled snapshot.
+    """
+
+    def __init__(self):
+        # uuid (skin, level or chroma) -> display name / image url
+        self.skin_names = {}
+        self.skin_images = {}
+        self.card_images = {}
+        # spray uuid -> (display name, image url)
+        self.sprays = {}
+        self.agent_icons = {}
+        self.weapon_categories = {}
+        self._skin_resolver = None
+
+    @property
+    def empty(self):
+        return not self.skin_names
+
+    @classmethod
+    def load(cls):
+        """Open the compiled snapshot, or build one from the cached datasets."""
+        catalog = snapshot.load()
+        if catalog is None:
+            catalog = cls.from_json()
+            if catalog.empty:
+                # nothing to compile; a snapshot would hide the datasets once they arrive
+                return catalog
+            try:
+                snapshot.write(catalog)
+            except Exception as e:
+                print(f"[!] Failed to write content snapshot: {e}")
+        return catalog
+
+    @classmethod
+    def from_json(cls):
+        """Build a catalog by parsing the cached datasets."""
+        catalog = cls()
+        catalog.index_skins(_load_dataset('weapon_skins'))
+        for card in _load_dataset('playercards'):
+            if card.get("uuid"):
+                catalog.card_images[card["uuid"].lower()] = card.get("largeArt") or card.get("wideArt")
+        for spray in _load_dataset('sprays'):
+            if spray.get("uuid"):
+                catalog.sprays[spray["uuid"].lower()] = (
+                    spray.get("displayName", "Unknown Spray"),
+                    spray.get("fullTransparentIcon") or spray.get("displayIcon"),
+                )
+        for agent in _load_dataset('agents'):
+            if agent.get("uuid"):
+                catalog.agent_icons[agent["uuid"].lower()] = agent.get("displayIcon")
+        for weapon in _load_dataset('weapons'):
+            if weapon.get("uuid"):
+                catalog.weapon_categories[weapon["uuid"].lower()] = weapon.get("category", "")
+        return catalog
+
+    def index_skins(self, skins):
+        for skin in skins:
+            uuid = skin.get("uuid", "").lower()
+            name = skin.get("displayName", "")
+            if not uuid:
+                continue
+            render = _first_render(skin)
+            self._add_skin(uuid, name, skin.get("displayIcon") or render)
+            for level in skin.get("levels", []):
+                level_uuid = level.get("uuid", "").lower()
+                if level_uuid:
+                    self._add_skin(level_uuid, name, level.get("displayIcon") or render)
+            for chroma in skin.get("chromas", []):
+                chroma_uuid = chroma.get("uuid", "").lower()
+                if chroma_uuid:
+                    self._add_skin(chroma_uuid, chroma.get("displayName", name),
+                                   chroma.get("fullRender") or chroma.get("displayIcon"))
+
+    def _add_skin(self, uuid, name, image_url):
+        if name:
+            self.skin_names[uuid] = name
+        # skins win over levels/chromas sharing an id, as in the old scan order
+        self.skin_images.setdefault(uuid, image_url)
+
+    def skin_name(self, uuid):
+        return self.skin_names.get(uuid.lower())
+
+    @property
+    def skin_resolver(self):
+        if self._skin_resolver is None:
+            self._skin_resolver = SkinResolver(self.skin_names)
+        return self._skin_resolver
+
+    def skin_image_url(self, uuid):
+        return self.skin_images.get(uuid.lower())
+
+    def card_image_url(self, uuid):
+        return self.card_images.get(uuid.lower())
+
+    def spray_info(self, uuid):
+        spray = self.sprays.get(uuid.lower())
+        if spray:
+            return {'name': spray[0], 'image_url': spray[1]}
+        return None
+
+    def agent_icon_url(self, uuid):
+        return self.agent_icons.get(uuid.lower())
+
+    def weapon_category(self, uuid):
+        return self.weapon_categories.get(uuid.lower())
+
+
+class SkinResolver:
+    """Exact and prefix lookup of skin names with a bounded negative cache.
+
+    resolve() returns (name, source) where source is one of "exact", "prefix",
+    "negative" (a cached miss) or "miss", so callers can see which path ran.
+    """
+
+    def __init__(self, names, negative_size=NEGATIVE_CACHE_SIZE):
+        self.names = names
+        self.sorted_ids = sorted(names)
+        # first 8 chars -> name of the first uuid seen with that prefix,
+        # same as the old linear scan which returned the first match
+        self.short_prefixes = {}
+        for uuid, name in names.items():
+            self.short_prefixes.setdefault(uuid[:8], name)
+        self.negative_size = negative_size
+        self._negative = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {'exact': 0, 'prefix': 0, 'negative': 0, 'miss': 0}
+
+    def resolve(self, skin_id):
+        sid = skin_id.lower()
+        name = self.names.get(sid)
+        if name:
+            return self._hit('exact', name)
+
+        with self._lock:
+            if sid in self._negative:
+                self._negative.move_to_end(sid)
+                self.counts['negative'] += 1
+                metrics.cache_lookup("skin_names", False)
+                return None, 'negative'
+
+        name = self._prefix_lookup(sid)
+        if name:
+            return self._hit('prefix', name)
+
+        with self._lock:
+            self._negative[sid] = True
+            if len(self._negative) > self.negative_size:
+                self._negative.popitem(last=False)
+            self.counts['miss'] += 1
+        metrics.cache_lookup("skin_names", False)
+        return None, 'miss'
+
+    def _prefix_lookup(self, sid):
+        if len(sid) >= 8:
+            return self.short_prefixes.get(sid[:8])
+        # short ids: first uuid in sorted order that starts with them
+        i = bisect.bisect_left(self.sorted_ids, sid)
+        if i < len(self.sorted_ids) and self.sorted_ids[i].startswith(sid):
+            return self.names[self.sorted_ids[i]]
+        return None
+
+    def _hit(self, source, name):
+        with self._lock:
+            self.counts[source] += 1
+        metrics.cache_lookup("skin_names", True)
+        return name, source
+
+
+def _first_render(skin):
+    chromas = skin.get("chromas") or [{}]
+    return chromas[0].get("fullRender")
+
+
+def get_catalog():
+    """Return the shared catalog, building it on first use.
+
+    An empty one is only kept for EMPTY_RETRY_INTERVAL, so a first start
+    without the datasets recovers once they can be fetched.
+    """
+    global _catalog, _catalog_built
+    catalog = _catalog
+    if catalog is None or (catalog.empty and time.monotonic() - _catalog_built > EMPTY_RETRY_INTERVAL):
+        with _catalog_lock:
+            if _catalog is catalog:
+                _catalog = ContentCatalog.load()
+                _catalog_built = time.monotonic()
+                print(f"[+] Indexed {len(_catalog.skin_names)} skin variants, "
+                      f"{len(_catalog.card_images)} cards, {len(_catalog.sprays)} sprays, "
+                      f"{len(_catalog.agent_icons)} agents.")
+    return _catalog
+
+
+def reload_catalog():
+    """Drop the shared catalog and rebuild it from the current cache."""
+    global _catalog, _catalog_built
+    with _catalog_lock:
+        _catalog = ContentCatalog.load()
+        _catalog_built = time.monotonic()
+    return _catalog
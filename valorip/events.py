@@ -0,0 +1,137 @@
+import base64
+import json
+import threading
+import time
+
+from . import constants, ws
+from .client import riot
+
+# game states shared with the refresh scheduler
+IDLE = "idle"
+PREGAME = "pregame"
+INGAME = "ingame"
+RANGE = "range"
+
+PRESENCE_EVENT = "OnJsonApiEvent_chat_v4_presences"
+SESSION_EVENT = "OnJsonApiEvent_product-session_v1_external-sessions"
+
+# WAMP message types used by the Riot Client websocket
+WAMP_SUBSCRIBE = 5
+WAMP_EVENT = 8
+
+
+def parse_presence_state(private):
+    """Turn the base64 'private' blob of a valorant presence into a game state."""
+    try:
+        data = json.loads(base64.b64decode(private))
+    except Exception:
+        return None
+    match = data.get("matchPresenceData") or data
+    loop_state = match.get("sessionLoopState") or data.get("sessionLoopState")
+    flow = match.get("provisioningFlow") or data.get("provisioningFlow")
+    if loop_state == "MENUS":
+        return IDLE
+    if loop_state == "PREGAME":
+        return PREGAME
+    if loop_state == "INGAME":
+        return RANGE if flow == "ShootingRange" else INGAME
+    return None
+
+
+class MatchEventWatcher:
+    """Subscribes to the Riot Client's local event feed and reports state changes.
+
+    on_change(state) is called from the watcher thread whenever our own
+    presence moves between idle/pregame/ingame/range, or when the game
+    session ends (state IDLE). While `connected` is False callers should
+    fall back to polling.
+    """
+
+    def __init__(self, on_change, host="127.0.0.1", port=None, password=None,
+                 use_ssl=True, reconnect_delay=5):
+        self.on_change = on_change
+        self.host = host
+        self.port = port
+        self.password = password
+        self.use_ssl = use_ssl
+        self.reconnect_delay = reconnect_delay
+        self.state = None
+        self.connected = False
+        self._socket = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._socket:
+            self._socket.close()
+
+    def _credentials(self):
+        # defaults to the lockfile values login already loaded into the client
+        port = self.port or riot.local_port
+        if self.password is not None:
+            auth = base64.b64encode(f"riot:{self.password}".encode()).decode()
+        else:
+            auth = riot.local_auth
+        return port, auth
+
+    def _run(self):
+        while not self._stop.is_set():
+            port, auth = self._credentials()
+            if not port or not auth:
+                time.sleep(1)
+                continue
+            try:
+                self._socket = ws.connect(
+                    self.host, int(port), headers={"Authorization": f"Basic {auth}"},
+                    use_ssl=self.use_ssl,
+                )
+                for event in (PRESENCE_EVENT, SESSION_EVENT):
+                    self._socket.send_text(json.dumps([WAMP_SUBSCRIBE, event]))
+                self.connected = True
+                print("[+] Subscribed to Riot Client events")
+                while not self._stop.is_set():
+                    message = self._socket.recv()
+                    if message is None:
+                        break
+                    self.handle_message(message)
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"[!] Event feed unavailable, polling instead: {e}")
+            finally:
+                self.connected = False
+            self._stop.wait(self.reconnect_delay)
+
+    def handle_message(self, message):
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(payload, list) or len(payload) < 3 or payload[0] != WAMP_EVENT:
+            return
+        event, body = payload[1], payload[2] or {}
+
+        if event == PRESENCE_EVENT:
+            presences = (body.get("data") or {}).get("presences") or []
+            for presence in presences:
+                if presence.get("puuid") != constants.PUUID or presence.get("product") != "valorant":
+                    continue
+                state = parse_presence_state(presence.get("private", ""))
+                if state:
+                    self._set_state(state)
+        elif event == SESSION_EVENT and body.get("eventType") == "Delete":
+            self._set_state(IDLE)
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        try:
+            self.on_change(state)
+        except Exception as e:
+            print(f"[!] Game state handler failed: {e}")
@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+import time
+
+from . import constants, metrics
+
+# names rarely change; after this long a cached one is still served but re-checked
+IDENTITY_TTL = 3 * 24 * 60 * 60
+# a failed lookup is retried after this long, doubling per failure up to the max
+RETRY_DELAY = 30
+RETRY_MAX_DELAY = 15 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS identities (
+    puuid TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class IdentityCache:
+    """PUUID -> GameName#TagLine, kept in memory and on disk across sessions."""
+
+    def __init__(self, path=None):
+        self.path = path or constants.APP_DATA_DIR / "identities.db"
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._names = {
+            puuid: (name, fetched_at)
+            for puuid, name, fetched_at in self._conn.execute("SELECT puuid, name, fetched_at FROM identities")
+        }
+        self._refreshing = set()
+        # puuid -> (consecutive failures, retry at); kept in memory only
+        self._failures = {}
+
+    def get(self, puuid):
+        with self._lock:
+            entry = self._names.get(puuid)
+        return entry[0] or None if entry else None
+
+    def lookup(self, puuids):
+        """Return ({puuid: name} for known ones, [unseen], [stale]).
+
+        A player the name service returned no name for is cached as "": it is
+        left out of the names but not asked for again until its TTL runs out.
+        Players whose last lookup failed are neither unseen nor stale until
+        their retry time.
+        """
+        now = time.time()
+        names, missing, stale = {}, [], []
+        with self._lock:
+            for puuid in puuids:
+                entry = self._names.get(puuid)
+                metrics.cache_lookup("identities", entry is not None)
+                if entry and entry[0]:
+                    names[puuid] = entry[0]
+                failure = self._failures.get(puuid)
+                if failure and now < failure[1]:
+                    continue
+                if entry is None:
+                    missing.append(puuid)
+                elif now - entry[1] >= IDENTITY_TTL:
+                    stale.append(puuid)
+        return names, missing, stale
+
+    def put(self, name_map):
+        now = time.time()
+        with self._lock:
+            for puuid, name in name_map.items():
+                self._names[puuid] = (name, now)
+                self._failures.pop(puuid, None)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO identities VALUES (?, ?, ?)",
+                [(puuid, name, now) for puuid, name in name_map.items()],
+            )
+            self._conn.commit()
+
+    def failed(self, puuids):
+        """Back off from PUUIDs whose lookup failed."""
+        now = time.time()
+        with self._lock:
+            for puuid in puuids:
+                count = self._failures.get(puuid, (0, 0))[0] + 1
+                delay = min(RETRY_DELAY * 2 ** (count - 1), RETRY_MAX_DELAY)
+                self._failures[puuid] = (count, now + delay)
+
+    def claim(self, puuids):
+        """Mark PUUIDs as being refreshed; returns the ones nobody else claimed."""
+        with self._lock:
+            claimed = [puuid for puuid in puuids if puuid not in self._refreshing]
+            self._refreshing.update(claimed)
+        return claimed
+
+    def release(self, puuids):
+        with self._lock:
+            self._refreshing.difference_update(puuids)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = IdentityCache()
+        return _cache
+
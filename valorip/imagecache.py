@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+from . import metrics
+
+# decoded pixels kept around for reuse (RGBA bytes, not file sizes)
+IMAGE_CACHE_BUDGET = 64 * 1024 * 1024
+
+
+def image_key(url, max_size=None, circle=False):
+    """Cache key for one rendering of an image: the same URL at another size
+    or with another transform is a different entry."""
+    return (url, tuple(max_size) if max_size else None, bool(circle))
+
+
+def image_cost(width, height):
+    return width * height * 4
+
+
+class ImageCache:
+    """LRU cache of rendered images bounded by an estimated memory budget.
+
+    Each entry carries its own cost (bytes of RGBA pixels); the least
+    recently used entries are dropped once the total goes over budget.
+    Widgets showing an evicted image keep their own reference to it.
+    """
+
+    def __init__(self, budget=IMAGE_CACHE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.cache_lookup("images", False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.cache_lookup("images", True)
+            return entry[0]
+
+    def put(self, key, value, cost):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if cost > self.budget:
+                # would evict everything else and still not fit
+                return
+            self._entries[key] = (value, cost)
+            self.size += cost
+            while self.size > self.budget:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self.size -= evicted_cost
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            }
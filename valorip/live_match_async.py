@@ -0,0 +1,90 @@
+import asyncio
+
+from . import constants, content, live_match
+from .client import riot
+
+# asyncio variant of the live_match API. Requests still go through the pooled
+# client.riot sessions on worker threads, but independent stages run
+# concurrently, so a tick costs the slowest request per dependency level
+# instead of the sum of all of them.
+
+
+async def _glz(method, path, **kwargs):
+    return await asyncio.to_thread(riot.glz, method, path, **kwargs)
+
+
+async def detect_match():
+    """Find the match: core-game first, then pregame; returns (match_id, phase, requests_made).
+
+    Pregame is only asked when core-game has no match for us, so an in-game
+    tick costs one lookup. Failed requests raise instead of reading as
+    "not in match".
+    """
+    requests_made = 0
+    for phase in ("core-game", "pregame"):
+        r = await _glz("GET", f"/{phase}/v1/players/{constants.PUUID}")
+        requests_made += 1
+        match_id = live_match._player_match_id(r, phase)
+        if match_id:
+            return match_id, phase, requests_made
+    raise live_match.NotInMatchError("Not in a match or range")
+
+
+async def _fetch_loadouts(match_id):
+    """Raw core-game loadouts entries keyed by PUUID (None if unavailable)."""
+    try:
+        return await asyncio.to_thread(live_match.fetch_loadout_entries, match_id)
+    except Exception as e:
+        print(f"Error fetching loadouts: {e}")
+        return None
+
+
+async def get_match_snapshot(with_loadouts=True):
+    """Build a MatchSnapshot, resolving every player's loadout in the same tick."""
+    match_id, phase, requests_made = await detect_match()
+
+    # the match document, the loadouts and the content catalog are independent
+    match_task = asyncio.create_task(_glz("GET", f"/{phase}/v1/matches/{match_id}"))
+    catalog_task = asyncio.create_task(asyncio.to_thread(content.get_catalog))
+    loadouts_task = None
+    # loadouts are fixed for the whole match, so only the first tick fetches them
+    cached_loadouts = live_match.cached_match_loadouts(match_id)
+    if with_loadouts and phase == "core-game" and cached_loadouts is None:
+        loadouts_task = asyncio.create_task(_fetch_loadouts(match_id))
+        requests_made += 1
+
+    r = await match_task
+    requests_made += 1
+    if r.status_code != 200:
+        if loadouts_task:
+            loadouts_task.cancel()
+        raise Exception(f"Failed to get match details (status {r.status_code})")
+    data = r.json()
+
+    puuids = [p.get("Subject") for p in live_match._match_players(data) if p.get("Subject")]
+    name_map, name_requests = await asyncio.to_thread(live_match.fetch_names, puuids)
+    requests_made += name_requests
+
+    snapshot = live_match.build_snapshot(match_id, phase, data, name_map, requests_made)
+
+    await catalog_task
+    if cached_loadouts is not None:
+        snapshot.loadouts = cached_loadouts
+    elif loadouts_task:
+        entries = await loadouts_task
+        if entries:
+            card_ids = {p.puuid: p.player_card_id for p in snapshot.players}
+            snapshot.loadouts = await asyncio.to_thread(live_match.organize_all, entries, card_ids)
+            live_match.store_match_loadouts(match_id, entries, snapshot.loadouts)
+    return snapshot
+
+
+async def get_live_match():
+    """Get live match details and players."""
+    snapshot = await get_match_snapshot(with_loadouts=False)
+    return snapshot.details, snapshot.blue, snapshot.red
+
+
+async def get_player_loadout_organized(match_id, puuid, snapshot=None):
+    """Fetch loadout organized by category."""
+    return await asyncio.to_thread(live_match.get_player_loadout_organized, match_id, puuid, snapshot)
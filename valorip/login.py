@@ -1,57 +1,146 @@
-import os, base64, requests, json
+import os, base64, hashlib, json, threading, time
 from . import constants
+from .client import riot
 
-requests.packages.urllib3.disable_warnings()
+LOCKFILE_PATH = os.path.expandvars(
+    r"%LOCALAPPDATA%\Riot Games\Riot Client\Config\lockfile"
+)
+# refresh this many seconds before the access token expires
+REFRESH_MARGIN = 300
 
 
-def ensure_logged_in():
-    """Read Riot Client lockfile, get tokens, and detect region/shard (like NOWT)."""
-    if constants.ACCESS_TOKEN and constants.PUUID:
-        return
-
-    lockfile_path = os.path.expandvars(
-        r"%LOCALAPPDATA%\Riot Games\Riot Client\Config\lockfile"
-    )
-    with open(lockfile_path, "r", encoding="utf-8") as f:
-        name, pid, port, password, proto = f.read().strip().split(":")
-
-    auth = base64.b64encode(f"riot:{password}".encode()).decode()
-    headers = {"Authorization": f"Basic {auth}"}
-
-    # 1) get entitlements + access token
-    ent = requests.get(
-        f"https://127.0.0.1:{port}/entitlements/v1/token",
-        headers=headers,
-        verify=False,
-    ).json()
-
-    constants.ACCESS_TOKEN = ent["accessToken"]
-    constants.ENTITLEMENTS_TOKEN = ent["token"]
-    constants.PUUID = ent["subject"]
-
-    # 2) detect region from product-session (this is what NOWT does)
+def decode_jwt_expiry(token):
+    """Return the 'exp' claim of a JWT as a unix timestamp, or None."""
     try:
-        sess = requests.get(
-            f"https://127.0.0.1:{port}/product-session/v1/external-sessions",
-            headers=headers,
-            verify=False,
-        ).json()
-
-        valorant = sess.get("valorant") or {}
-        args = valorant.get("launchConfiguration", {}).get("arguments", [])
-        region, shard = "eu", "eu"
-        for arg in args:
-            if arg.startswith("--region="):
-                region = arg.split("=", 1)[1]
-            if arg.startswith("--shard="):
-                shard = arg.split("=", 1)[1]
-        constants.REGION = region
-        constants.SHARD = shard
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get("exp")
     except Exception:
-        # fallback
-        constants.REGION = constants.REGION or "eu"
-        constants.SHARD = constants.SHARD or "eu"
+        return None
+
+
+class CredentialManager:
+    """Keeps the Riot access/entitlement tokens valid for the whole session.
+
+    Tokens come from the local client's entitlements endpoint and are
+    refreshed shortly before their JWT expiry, or once after a 401. The
+    lockfile and the region/shard it resolved to are cached on disk so a
+    restart against the same client skips the product-session lookup.
+    """
+
+    def __init__(self, lockfile_path=LOCKFILE_PATH, cache_path=None):
+        self.lockfile_path = lockfile_path
+        self._cache_path = cache_path
+        self.expires_at = None
+        self.lockfile = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_path(self):
+        # resolved on use, so a replay's own data dir is picked up
+        return self._cache_path or constants.APP_DATA_DIR / "session.json"
+
+    def ensure_logged_in(self):
+        with self._lock:
+            if constants.ACCESS_TOKEN and constants.PUUID and not self._expiring():
+                return
+            first_login = not constants.ACCESS_TOKEN
+            self._read_lockfile()
+            self._fetch_tokens()
+            if first_login:
+                self._detect_region()
+                # open connections to glz/pd before the first poll needs them
+                riot.warm_up()
+                print(
+                    f"[+] Logged in! Region={constants.REGION} Shard={constants.SHARD} PUUID={constants.PUUID[:8]}..."
+                )
+
+    def refresh(self, rejected_token=None):
+        """Fetch fresh tokens now (e.g. after a 401).
+
+        Concurrent 401s share one refresh: if the token changed since the
+        rejected request went out, another thread already refreshed it.
+        """
+        with self._lock:
+            if rejected_token is not None and constants.ACCESS_TOKEN != rejected_token:
+                return True
+            self._read_lockfile()
+            self._fetch_tokens()
+        return True
+
+    def _expiring(self):
+        return self.expires_at is not None and time.time() > self.expires_at - REFRESH_MARGIN
+
+    def _read_lockfile(self):
+        with open(self.lockfile_path, "r", encoding="utf-8") as f:
+            self.lockfile = f.read().strip()
+        name, pid, port, password, proto = self.lockfile.split(":")
+        riot.set_local(port, password)
 
-    print(
-        f"[+] Logged in! Region={constants.REGION} Shard={constants.SHARD} PUUID={constants.PUUID[:8]}..."
-    )
+    def _fetch_tokens(self):
+        ent = riot.local("GET", "/entitlements/v1/token").json()
+        constants.ACCESS_TOKEN = ent["accessToken"]
+        constants.ENTITLEMENTS_TOKEN = ent["token"]
+        constants.PUUID = ent["subject"]
+        self.expires_at = decode_jwt_expiry(constants.ACCESS_TOKEN)
+        if self.expires_at:
+            left = int(self.expires_at - time.time())
+            print(f"[+] Access token valid for {left // 60} min")
+
+    def _lockfile_hash(self):
+        # the lockfile holds the client's password, so only a digest is stored
+        return hashlib.sha256(self.lockfile.encode()).hexdigest()
+
+    def _load_cache(self):
+        try:
+            return json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+
+    def _detect_region(self):
+        # same client process and same account as last time: reuse its region
+        cached = self._load_cache()
+        if (cached.get("lockfile") == self._lockfile_hash() and cached.get("puuid") == constants.PUUID
+                and cached.get("region") and cached.get("shard")):
+            constants.REGION = cached["region"]
+            constants.SHARD = cached["shard"]
+            return
+
+        # detect region from product-session (this is what NOWT does)
+        try:
+            sess = riot.local("GET", "/product-session/v1/external-sessions").json()
+
+            valorant = sess.get("valorant") or {}
+            args = valorant.get("launchConfiguration", {}).get("arguments", [])
+            region, shard = "eu", "eu"
+            for arg in args:
+                if arg.startswith("--region="):
+                    region = arg.split("=", 1)[1]
+                if arg.startswith("--shard="):
+                    shard = arg.split("=", 1)[1]
+            constants.REGION = region
+            constants.SHARD = shard
+        except Exception:
+            # fallback, not worth caching
+            constants.REGION = constants.REGION or "eu"
+            constants.SHARD = constants.SHARD or "eu"
+            return
+
+        try:
+            self.cache_path.write_text(json.dumps({
+                "lockfile": self._lockfile_hash(),
+                "puuid": constants.PUUID,
+                "region": constants.REGION,
+                "shard": constants.SHARD,
+            }), encoding="utf-8")
+        except OSError as e:
+            print(f"[!] Failed to cache session: {e}")
+
+
+credentials = CredentialManager()
+riot.on_unauthorized = credentials.refresh
+
+
+def ensure_logged_in():
+    """Read Riot Client lockfile, get tokens, and detect region/shard (like NOWT)."""
+    credentials.ensure_logged_in()
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from . import constants, metrics, valapi
+from .client import riot
+
+# content-addressed store for valorant-api media: objects/<sha256> holds the
+# bytes, media.db maps URLs and (source hash, transform) pairs onto them;
+# both live under APP_DATA_DIR/media unless another root is given
+MEDIA_CACHE_CAP = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS originals (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    etag TEXT,
+    version TEXT,
+    used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS derivatives (
+    source_hash TEXT NOT NULL,
+    transform TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (source_hash, transform)
+);
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+
+class MediaCache:
+    """Persistent image cache keyed by content hash.
+
+    Originals are revalidated (If-None-Match) only when the valorant-api
+    content version differs from the one they were stored under.
+    Derivatives are keyed by their source's hash, so they survive a
+    revalidation that returns the same bytes. Least recently used entries
+    go once the store is over its size cap.
+    """
+
+    def __init__(self, root=None, cap=MEDIA_CACHE_CAP):
+        self.root = root = root or constants.APP_DATA_DIR / "media"
+        self.cap = cap
+        self.version = valapi.load_manifest().get("version")
+        (root / "objects").mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(root / "media.db", check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def _object_path(self, digest):
+        return self.root / "objects" / digest[:2] / digest
+
+    def _read(self, digest):
+        try:
+            return self._object_path(digest).read_bytes()
+        except OSError:
+            return None
+
+    def _store(self, data):
+        """Write bytes under their hash (once) and return the hash. Lock held."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        known = self._conn.execute("SELECT 1 FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if known and path.exists():
+            return digest
+        # a known object whose file went missing is written again under the same row
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        if not known:
+            self._conn.execute("INSERT INTO objects VALUES (?, ?)", (digest, len(data)))
+            self.size += len(data)
+        return digest
+
+    def fetch(self, url):
+        """Return (bytes, hash) for a media URL, downloading only when needed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash, etag, version FROM originals WHERE url = ?", (url,)
+            ).fetchone()
+        if row:
+            digest, etag, version = row
+            data = self._read(digest)
+            if data is not None and (self.version is None or version == self.version):
+                self._touch("originals", "url = ?", (url,))
+                metrics.cache_lookup("media", True)
+                return data, digest
+        else:
+            digest, etag, data = None, None, None
+        metrics.cache_lookup("media", False)
+
+        headers = {"If-None-Match": etag} if etag and data is not None else {}
+        r = riot.get(url, headers=headers)
+        if r.status_code == 304:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE originals SET version = ?, used_at = ? WHERE url = ?", (self.version, time.time(), url)
+                )
+                self._conn.commit()
+            return data, digest
+        r.raise_for_status()
+
+        with self._lock:
+            digest = self._store(r.content)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO originals VALUES (?, ?, ?, ?, ?)",
+                (url, digest, r.headers.get("ETag"), self.version, time.time()),
+            )
+            self._conn.commit()
+        self._evict()
+        return r.content, digest
+
+    def get_derivative(self, source_hash, transform):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM derivatives WHERE source_hash = ? AND transform = ?", (source_hash, transform)
+            ).fetchone()
+        data = self._read(row[0]) if row else None
+        metrics.cache_lookup("media_derivatives", data is not None)
+        if data is not None:
+            self._touch("derivatives", "source_hash = ? AND transform = ?", (source_hash, transform))
+        return data
+
+    def put_derivative(self, source_hash, transform, data):
+        with self._lock:
+            digest = self._store(data)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO derivatives VALUES (?, ?, ?, ?)",
+                (source_hash, transform, digest, time.time()),
+            )
+            self._conn.commit()
+        self._evict()
+
+    def _touch(self, table, where, args):
+        with self._lock:
+            self._conn.execute(f"UPDATE {table} SET used_at = ? WHERE {where}", (time.time(), *args))
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries, then unreferenced objects, until under the cap."""
+        with self._lock:
+            if self.size <= self.cap:
+                return
+            entries = self._conn.execute(
+                "SELECT 'originals', url, NULL, hash, used_at FROM originals "
+                "UNION ALL SELECT 'derivatives', source_hash, transform, hash, used_at FROM derivatives "
+                "ORDER BY used_at"
+            ).fetchall()
+            sizes = dict(self._conn.execute("SELECT hash, size FROM objects"))
+            refs = {}
+            for *_, digest, _ in entries:
+                refs[digest] = refs.get(digest, 0) + 1
+            # pick the batch up front, counting an object as freed once its last entry goes
+            projected = self.size
+            originals, derivatives = [], []
+            for table, key, transform, digest, _ in entries:
+                if projected <= self.cap:
+                    break
+                if table == "originals":
+                    originals.append((key,))
+                else:
+                    derivatives.append((key, transform))
+                refs[digest] -= 1
+                if not refs[digest]:
+                    projected -= sizes.get(digest, 0)
+            self._conn.executemany("DELETE FROM originals WHERE url = ?", originals)
+            self._conn.executemany(
+                "DELETE FROM derivatives WHERE source_hash = ? AND transform = ?", derivatives
+            )
+            self._drop_unreferenced()
+            self._conn.commit()
+
+    def _drop_unreferenced(self):
+        orphans = self._conn.execute(
+            "SELECT hash, size FROM objects WHERE hash NOT IN (SELECT hash FROM originals) "
+            "AND hash NOT IN (SELECT hash FROM derivatives)"
+        ).fetchall()
+        for digest, size in orphans:
+            try:
+                self._object_path(digest).unlink()
+            except OSError:
+                pass
+            self._conn.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+            self.size -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MediaCache()
+        return _cache
+
+
+def render_image(img, max_size=None, circle=False):
+    """Apply the circle mask and aspect-preserving resize to a PIL image."""
+    if circle:
+        # Create circular mask
+        size = min(img.size)
+        mask = Image.new('L', (size, size), 0)
+        draw = ImageDraw.Draw(mask)
+        draw.ellipse((0, 0, size, size), fill=255)
+
+        # Crop to square and apply mask
+        img = img.crop(((img.width - size) // 2, (img.height - size) // 2,
+                        (img.width + size) // 2, (img.height + size) // 2))
+
+        output = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        output.paste(img, (0, 0))
+        output.putalpha(mask)
+        img = output
+
+    if max_size:
+        img_width, img_height = img.size
+        max_width, max_height = max_size
+
+        scale_factor = min(max_width / img_width, max_height / img_height)
+        new_width = int(img_width * scale_factor)
+        new_height = int(img_height * scale_factor)
+
+        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return img
+
+
+def load_rendered(url, max_size=None, circle=False):
+    """PIL image for a media URL at the given size/transform, from disk when possible."""
+    cache = get_cache()
+    data, digest = cache.fetch(url)
+    transform = f"{max_size[0]}x{max_size[1]}" if max_size else "orig"
+    if circle:
+        transform += ":circle"
+    rendered = cache.get_derivative(digest, transform)
+    if rendered is not None:
+        return Image.open(BytesIO(rendered))
+
+    img = render_image(Image.open(BytesIO(data)), max_size, circle)
+    out = BytesIO()
+    img.save(out, format="PNG")
+    cache.put_derivative(digest, transform, out.getvalue())
+    return img
+
+
+def decode_rgba(url, max_size=None, circle=False):
+    """(size, raw RGBA bytes) for a media URL, decoded and resized off the Tk thread."""
+    img = load_rendered(url, max_size, circle).convert("RGBA")
+    return img.size, img.tobytes()
@@ -0,0 +1,201 @@
+import json
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+# in-process metrics: every outbound request, cache lookup and refresh cycle
+# is recorded here and can be dumped as JSON or Prometheus text on demand
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CYCLE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
+_NUMBER = re.compile(r"/\d+(?=/|$)")
+# Henrik routes that carry a Riot ID instead of a resource id
+_RIOT_ID_ROUTES = (
+    (re.compile(r"^(/valorant/v\d+/mmr/[^/]+/[^/]+)/[^/]+/[^/]+"), r"\1/{name}/{tag}"),
+    (re.compile(r"^(/valorant/v\d+/account)/[^/]+/[^/]+"), r"\1/{name}/{tag}"),
+)
+
+
+def endpoint_template(url):
+    """(host, path template) for a URL, with ids, numbers and Riot IDs folded
+    into placeholders so every player and match lands in the same series."""
+    parts = urlsplit(url)
+    path = parts.path
+    for pattern, template in _RIOT_ID_ROUTES:
+        path = pattern.sub(template, path)
+    path = _NUMBER.sub("/{n}", _UUID.sub("{uuid}", path))
+    return parts.hostname or "", path
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self.values.items()]
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {'counts': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+            entry['count'] += 1
+            entry['sum'] += value
+
+    def samples(self):
+        with self._lock:
+            return [
+                (dict(zip(self.labelnames, key)), {
+                    'count': entry['count'],
+                    'sum': round(entry['sum'], 6),
+                    'buckets': dict(zip(map(str, self.buckets), entry['counts'])),
+                })
+                for key, entry in self.values.items()
+            ]
+
+
+class Registry:
+    """Named counters and histograms; creating one that exists returns it."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def to_dict(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {
+            metric.name: {
+                'type': 'counter' if isinstance(metric, Counter) else 'histogram',
+                'help': metric.help,
+                'samples': [{'labels': labels, 'value': value} for labels, value in metric.samples()],
+            }
+            for metric in metrics
+        }
+
+    def to_prometheus(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            kind = 'counter' if isinstance(metric, Counter) else 'histogram'
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            for labels, value in metric.samples():
+                if kind == 'counter':
+                    lines.append(f"{metric.name}{_format_labels(labels)} {value}")
+                    continue
+                for bound, count in value['buckets'].items():
+                    lines.append(f"{metric.name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{metric.name}_bucket{_format_labels(dict(labels, le='+Inf'))} {value['count']}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "valoripper_http_requests_total", "Outbound HTTP requests", ("host", "endpoint", "method", "status"))
+HTTP_LATENCY = registry.histogram(
+    "valoripper_http_request_seconds", "Outbound HTTP request latency, body included", ("host", "endpoint"))
+HTTP_BYTES = registry.counter(
+    "valoripper_http_response_bytes_total", "Outbound HTTP response body bytes", ("host", "endpoint"))
+CACHE_LOOKUPS = registry.counter(
+    "valoripper_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+REFRESH_CYCLES = registry.histogram(
+    "valoripper_refresh_cycle_seconds", "Refresh cycle duration by resulting game state", ("state",),
+    buckets=CYCLE_BUCKETS)
+REFRESH_REQUESTS = registry.histogram(
+    "valoripper_refresh_requests", "Upstream requests made per refresh cycle", ("phase",),
+    buckets=COUNT_BUCKETS)
+
+
+def observe_request(method, url, status, seconds, size):
+    host, endpoint = endpoint_template(url)
+    HTTP_REQUESTS.inc(host=host, endpoint=endpoint, method=method, status=status)
+    HTTP_LATENCY.observe(seconds, host=host, endpoint=endpoint)
+    if size:
+        HTTP_BYTES.inc(size, host=host, endpoint=endpoint)
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def hit_rates():
+    """{cache: {hits, misses, hit_rate}} from the lookup counter."""
+    rates = {}
+    for labels, value in CACHE_LOOKUPS.samples():
+        entry = rates.setdefault(labels['cache'], {'hits': 0, 'misses': 0})
+        entry['hits' if labels['result'] == 'hit' else 'misses'] += value
+    for entry in rates.values():
+        lookups = entry['hits'] + entry['misses']
+        entry['hit_rate'] = round(entry['hits'] / lookups, 3) if lookups else None
+    return rates
+
+
+def to_json():
+    return json.dumps({
+        'generated_at': time.time(),
+        'hit_rates': hit_rates(),
+        'metrics': registry.to_dict(),
+    })
+
+
+def to_prometheus():
+    return registry.to_prometheus()
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 @dataclass
 class IgnData:
@@ -14,9 +14,35 @@ class Player:
     team_id: str
     ign: IgnData
     identity: IdentityData
+    character_id: str | None = None
+    rank_tier: int = 0
+    player_card_id: str | None = None
 
 @dataclass
 class MatchDetails:
     game_mode: str
     map_name: str
     server: str
+
+@dataclass
+class MatchSnapshot:
+    """Everything one refresh cycle learned about the current match."""
+    match_id: str
+    phase: str  # "core-game" or "pregame"
+    details: MatchDetails
+    blue: list[Player] = field(default_factory=list)
+    red: list[Player] = field(default_factory=list)
+    provisioning_flow: str = ""
+    requests_made: int = 0
+    # puuid -> organized loadout, when the cycle resolved them
+    loadouts: dict = field(default_factory=dict)
+
+    @property
+    def players(self):
+        return self.blue + self.red
+
+    def get_player(self, puuid):
+        for player in self.players:
+            if player.puuid == puuid:
+                return player
+        return None
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+from . import content, events, live_match, live_match_async, login, metrics, stats, valapi
+
+
+def load_content():
+    """Make sure the static datasets, the catalog and the skin map are loaded."""
+    valapi.ensure_static_data()
+    content.get_catalog()
+    live_match.load_skin_map()
+
+
+def reload_content(changed):
+    """Rebuild the content catalog after a background refresh rewrote datasets."""
+    print(f"[*] Static data changed ({', '.join(changed)}), reloading catalog...")
+    content.reload_catalog()
+    live_match.load_skin_map()
+
+
+class MatchPipeline:
+    """The refresh pipeline, with no UI attached.
+
+    cycle() is a RefreshScheduler cycle: it fetches one MatchSnapshot, warms
+    the stats cache for players it has not queued yet and hands the result to
+    every subscriber as on_update(snapshot, state, error), on the scheduler
+    thread.
+    The Tk window and the snapshot server both sit on top of it, so the
+    upstream load does not depend on how many consumers are attached.
+    """
+
+    def __init__(self, watcher=None):
+        # a connected MatchEventWatcher lets menus skip remote polling
+        self.watcher = watcher
+        self.snapshot = None
+        self.state = None
+        self.error = None
+        self.match_id = None
+        # players of the current match whose stats were already queued
+        self.prefetched = set()
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, on_update):
+        with self._lock:
+            self._subscribers.append(on_update)
+        return on_update
+
+    def unsubscribe(self, on_update):
+        with self._lock:
+            if on_update in self._subscribers:
+                self._subscribers.remove(on_update)
+
+    def cycle(self):
+        # With the event feed up, menus need no remote polling; state changes
+        # trigger a cycle through the scheduler instead
+        if self.watcher and self.watcher.connected and self.watcher.state == events.IDLE:
+            self._publish(None, events.IDLE, None)
+            return events.IDLE
+        # Once a live match is loaded its roster and loadouts are settled; the
+        # feed says when it ends, so there is nothing to poll for until then
+        if self._settled_in_match():
+            return self.state
+
+        try:
+            login.ensure_logged_in()
+            snapshot = asyncio.run(live_match_async.get_match_snapshot())
+        except Exception as e:
+            state = events.IDLE if isinstance(e, live_match.NotInMatchError) else None
+            self._publish(None, state, e)
+            return state
+
+        print(f"[*] Refresh ({snapshot.phase}) made {snapshot.requests_made} requests")
+        metrics.REFRESH_REQUESTS.observe(snapshot.requests_made, phase=snapshot.phase)
+
+        # Warm the stats cache so every popup opens instantly; pregame only
+        # lists our team, so enemies get queued once the game starts
+        if snapshot.match_id != self.match_id:
+            self.match_id = snapshot.match_id
+            self.prefetched = set()
+        new = {p.puuid for p in snapshot.players} - self.prefetched
+        if new:
+            self.prefetched |= new
+            stats.prefetch_match(snapshot, new)
+
+        state = live_match.game_state(snapshot)
+        self._publish(snapshot, state, None)
+        return state
+
+    def _settled_in_match(self):
+        watcher = self.watcher
+        return bool(
+            watcher and watcher.connected
+            and watcher.state in (events.INGAME, events.RANGE) and self.state == watcher.state
+            and self.snapshot is not None and self.snapshot.phase == "core-game"
+            # keep polling until the loadouts came through (the range has none)
+            and (self.snapshot.loadouts or watcher.state == events.RANGE)
+            and self.error is None
+        )
+
+    def _publish(self, snapshot, state, error):
+        # keep the last match on transient errors, drop it once we are out of it
+        if snapshot is not None or state == events.IDLE:
+            self.snapshot = snapshot
+        self.state = state
+        self.error = error
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for on_update in subscribers:
+            try:
+                on_update(snapshot, state, error)
+            except Exception as e:
+                print(f"[!] Snapshot subscriber failed: {e}")
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class RateLimitedError(Exception):
+    """Raised instead of waiting when the upstream quota is exhausted."""
+
+
+class TokenBucket:
+    """Client-side token bucket that also obeys the server's own quota headers.
+
+    acquire() waits for a token, but raises RateLimitedError instead of
+    waiting past max_wait, so batch work can give up early and leave the
+    quota to interactive requests.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait=10.0):
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if now + wait > deadline:
+                raise RateLimitedError(f"rate limited for another {wait:.1f}s")
+            time.sleep(wait)
+
+    def block(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def update_from_headers(self, status_code, headers):
+        """Sync with x-ratelimit-remaining/-reset and Retry-After from a response."""
+        retry_after = _number(headers.get("Retry-After"))
+        reset = _number(headers.get("x-ratelimit-reset"))
+        remaining = _number(headers.get("x-ratelimit-remaining"))
+
+        if status_code == 429:
+            self.block(retry_after or reset or 60)
+            return
+        if remaining is not None:
+            with self._lock:
+                self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset:
+                self.block(reset)
+
+    @property
+    def blocked(self):
+        return time.monotonic() < self.blocked_until
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
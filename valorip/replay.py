@@ -0,0 +1,289 @@
+import base64
+import bisect
+import datetime
+import gzip
+import json
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from . import constants
+from .client import POOL_SIZE, riot
+
+# session logs are gzip'd JSON lines, one HTTP exchange per line, flushed after
+# every exchange so a crashed session still leaves a readable log
+LOG_FORMAT = 1
+SPEEDS = ("recorded", "fast")
+# local client responses carry tokens and launch secrets; never write them out
+_SECRET_KEYS = ("token", "password", "secret")
+
+
+def exchange_key(method, url, body=None):
+    """What a replayed request is matched on. The local client's port changes
+    with every client start, so it is left out."""
+    parts = urlsplit(url)
+    netloc = parts.hostname if parts.hostname == "127.0.0.1" else parts.netloc
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return f"{method} {urlunsplit(parts._replace(netloc=netloc, fragment=''))} {body or ''}"
+
+
+def _redact(value, key=""):
+    if isinstance(value, dict):
+        return {k: _redact(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v, key) for v in value]
+    if isinstance(value, str):
+        if any(secret in key.lower() for secret in _SECRET_KEYS):
+            return "redacted"
+        # launch arguments look like -remoting-auth-token=...
+        name, sep, _ = value.partition("=")
+        if sep and name.startswith("-") and any(secret in name.lower() for secret in _SECRET_KEYS):
+            return f"{name}=redacted"
+    return value
+
+
+def _encode_body(url, content):
+    if urlsplit(url).hostname == "127.0.0.1":
+        try:
+            content = json.dumps(_redact(json.loads(content))).encode()
+        except ValueError:
+            content = b""
+    try:
+        return content.decode("utf-8"), None
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode(), "base64"
+
+
+class Recorder:
+    """Appends every exchange to a compressed session log."""
+
+    def __init__(self, path):
+        self.path = path
+        self.started = time.monotonic()
+        self._file = gzip.open(path, "ab")
+        self._lock = threading.Lock()
+        self._region_noted = False
+        self._write({"format": LOG_FORMAT, "session": time.time()})
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+
+    def record(self, request, response, elapsed):
+        if not self._region_noted and constants.REGION:
+            # login resolves these after the header went out; a replay needs
+            # them to build the same glz/pd URLs
+            self._region_noted = True
+            self._write({"region": constants.REGION, "shard": constants.SHARD})
+        content, encoding = _encode_body(request.url, response.content)
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", "replace")
+        self._write({
+            "t": round(time.monotonic() - self.started - elapsed, 4),
+            "method": request.method,
+            "url": request.url,
+            "body": body,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() != "set-cookie"},
+            "content": content,
+            "encoding": encoding,
+            "elapsed": round(elapsed, 4),
+        })
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """A normal pooled adapter that also logs each exchange."""
+
+    def __init__(self, recorder, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # the body is read here, as RiotClient's callers never stream
+        response.content
+        self.recorder.record(request, response, time.perf_counter() - start)
+        return response
+
+
+def read_records(path):
+    """Every record in a session log, in order; a truncated tail is dropped."""
+    records = []
+    with gzip.open(path, "rb") as f:
+        try:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        except (EOFError, zlib.error, OSError):
+            pass
+    return records
+
+
+def read_log(path):
+    """All exchanges in a session log, in order."""
+    return [record for record in read_records(path) if "method" in record]
+
+
+def session_info(records):
+    """The non-exchange records (format, start time, region, shard) merged."""
+    info = {}
+    for record in records:
+        if "method" not in record:
+            info.update(record)
+    return info
+
+
+class Tape:
+    """Recorded responses grouped by exchange_key.
+
+    "recorded" speed follows the session's own timeline: a request gets the
+    last response recorded for it at that point of the session, after the
+    recorded latency. "fast" hands out each key's responses in order with no
+    waiting and keeps repeating the last one, so polling loops see the match
+    progress once per call.
+    """
+
+    def __init__(self, exchanges, speed="recorded"):
+        if speed not in SPEEDS:
+            raise ValueError(f"unknown replay speed {speed!r}")
+        self.speed = speed
+        self.started = None
+        self.duration = max((e["t"] + e["elapsed"] for e in exchanges), default=0)
+        self.exchanges = {}
+        for exchange in exchanges:
+            key = exchange_key(exchange["method"], exchange["url"], exchange["body"])
+            self.exchanges.setdefault(key, []).append(exchange)
+        self._times = {key: [e["t"] for e in entries] for key, entries in self.exchanges.items()}
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, speed="recorded"):
+        return cls(read_log(path), speed)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+    @property
+    def exhausted(self):
+        """True once the session's duration has passed (recorded speed), or
+        once every request made so far has used up its responses (fast)."""
+        if self.speed == "recorded":
+            return self.elapsed >= self.duration
+        with self._lock:
+            return bool(self._positions) and all(
+                position >= len(self.exchanges[key]) for key, position in self._positions.items()
+            )
+
+    def next(self, key):
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+            entries = self.exchanges.get(key)
+            if not entries:
+                return None
+            if self.speed == "recorded":
+                i = max(bisect.bisect_right(self._times[key], self.elapsed) - 1, 0)
+            else:
+                i = self._positions.get(key, 0)
+                self._positions[key] = i + 1
+            return entries[min(i, len(entries) - 1)]
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from a Tape; anything not on it fails like an offline host."""
+
+    def __init__(self, tape):
+        super().__init__()
+        self.tape = tape
+
+    def send(self, request, **kwargs):
+        exchange = self.tape.next(exchange_key(request.method, request.url, request.body))
+        if exchange is None:
+            raise ConnectionError(f"{request.method} {request.url} is not in the replayed session", request=request)
+        if self.tape.speed == "recorded":
+            time.sleep(exchange["elapsed"])
+
+        response = Response()
+        response.status_code = exchange["status"]
+        response.reason = exchange["reason"]
+        response.headers = CaseInsensitiveDict(exchange["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        content = exchange["content"]
+        response._content = base64.b64decode(content) if exchange["encoding"] == "base64" else content.encode("utf-8")
+        response.url = request.url
+        response.request = request
+        response.elapsed = datetime.timedelta(seconds=exchange["elapsed"])
+        return response
+
+    def close(self):
+        pass
+
+
+def start_recording(path, client=riot):
+    recorder = Recorder(path)
+    client.mount(lambda: RecordingAdapter(recorder, pool_connections=1, pool_maxsize=POOL_SIZE))
+    print(f"[*] Recording HTTP session to {path}")
+    return recorder
+
+
+def start_replay(path, speed="recorded", client=riot):
+    """Serve every request from a session log instead of the network.
+
+    The replay runs in a fresh data dir, so it never touches the live caches
+    and every run of a log starts equally cold; only the static datasets are
+    copied over, as sessions are rarely recorded with them cold. Login still
+    reads a lockfile, so a stand-in one is written; its port is never
+    connected to, as local calls are answered from the log as well.
+    """
+    from . import login, valapi
+
+    records = read_records(path)
+    tape = Tape([record for record in records if "method" in record], speed)
+    live_dir = constants.APP_DATA_DIR
+    constants.APP_DATA_DIR = Path(tempfile.mkdtemp(prefix="valoripper-replay-"))
+    valapi.copy_static_data(live_dir)
+    print(f"[*] Replay data dir: {constants.APP_DATA_DIR}")
+
+    # login keeps these when the product-session lookup is not in the log
+    info = session_info(records)
+    if info.get("region"):
+        constants.REGION, constants.SHARD = info["region"], info.get("shard") or info["region"]
+    lockfile = constants.APP_DATA_DIR / "replay_lockfile"
+    lockfile.write_text("Riot Client:0:0:replay:https", encoding="utf-8")
+    login.credentials.lockfile_path = str(lockfile)
+    client.mount(lambda: ReplayAdapter(tape))
+    count = sum(len(entries) for entries in tape.exchanges.values())
+    print(f"[*] Replaying {count} exchanges ({tape.duration:.0f}s session) from {path} at {speed} speed")
+    return tape
+
+
+def configure():
+    """Start recording or replaying if constants ask for it; returns the Recorder/Tape or None."""
+    if constants.REPLAY_PATH:
+        return start_replay(constants.REPLAY_PATH, constants.REPLAY_SPEED)
+    if constants.RECORD_PATH:
+        return start_recording(constants.RECORD_PATH)
+    return None
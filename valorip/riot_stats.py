@@ -0,0 +1,119 @@
+from .client import riot
+from .ratelimit import RateLimitedError, TokenBucket
+
+# competitive tier number -> name (1 and 2 are unused)
+_DIVISIONS = ["Iron", "Bronze", "Silver", "Gold", "Platinum", "Diamond", "Ascendant", "Immortal"]
+TIER_NAMES = {0: "Unranked", 1: "Unranked", 2: "Unranked", 27: "Radiant"}
+for _i, _division in enumerate(_DIVISIONS):
+    for _step in range(3):
+        TIER_NAMES[3 + _i * 3 + _step] = f"{_division} {_step + 1}"
+
+# competitiveupdates page size (the endpoint caps it at 20)
+PAGE_SIZE = 20
+# every match costs one match-details call here, so the window stays shallow
+HISTORY_DEPTH = 20
+
+# pd has no documented quota; stay well clear of it and obey its 429s
+pd_limiter = TokenBucket(rate=2, capacity=10)
+
+
+def _pd_json(path, max_wait=10.0):
+    """GET a pd endpoint through the limiter; None unless it answered 200."""
+    pd_limiter.acquire(max_wait)
+    r = riot.pd("GET", path)
+    pd_limiter.update_from_headers(r.status_code, r.headers)
+    if r.status_code == 429:
+        raise RateLimitedError(f"pd rate limited ({path.split('?')[0]})")
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+
+def mmr_stats(puuid):
+    """Current rank, peak rank and current-act win rate from pd mmr/v1."""
+    data = _pd_json(f"/mmr/v1/players/{puuid}")
+    if not data:
+        return {}
+
+    stats = {}
+    latest = data.get("LatestCompetitiveUpdate") or {}
+    tier = latest.get("TierAfterUpdate", 0) or 0
+    rr = latest.get("RankedRatingAfterUpdate", 0) or 0
+    if tier > 2:
+        stats['rank'] = f"{TIER_NAMES.get(tier, tier)} ({rr} RR)"
+    else:
+        stats['rank'] = 'Unranked'
+
+    seasons = ((data.get("QueueSkills") or {}).get("competitive") or {}).get("SeasonalInfoBySeasonID") or {}
+    peak = 0
+    for info in seasons.values():
+        tiers = [int(t) for t in (info.get("WinsByTier") or {})]
+        peak = max([peak, info.get("CompetitiveTier", 0) or 0] + tiers)
+    stats['peak_rank'] = TIER_NAMES.get(peak, 'Unknown')
+
+    act = seasons.get(latest.get("SeasonID")) or {}
+    games = act.get("NumberOfGames", 0) or 0
+    if games > 0:
+        stats['win_rate'] = round((act.get("NumberOfWins", 0) / games) * 100, 1)
+    return stats
+
+
+def recent_match_ids(puuid, size, known_ids=()):
+    """Newest-first competitive match IDs, paging until a known one or `size`."""
+    match_ids = []
+    start = 0
+    while len(match_ids) < size:
+        end = start + min(PAGE_SIZE, size - len(match_ids))
+        data = _pd_json(f"/mmr/v1/players/{puuid}/competitiveupdates?startIndex={start}&endIndex={end}&queue=competitive")
+        if data is None:
+            return None if start == 0 else match_ids
+        matches = data.get("Matches") or []
+        for match in matches:
+            if match.get("MatchID") in known_ids:
+                return match_ids
+            match_ids.append(match.get("MatchID"))
+        if len(matches) < end - start:
+            break
+        start = end
+    return match_ids
+
+
+def match_row(puuid, match_id):
+    """One per-match stat row for a player from pd match-details."""
+    data = _pd_json(f"/match-details/v1/matches/{match_id}")
+    if not data:
+        return None
+    player = next((p for p in data.get("players", []) if p.get("subject") == puuid), None)
+    if not player:
+        return None
+    row = {
+        'match_id': match_id,
+        'started_at': (data.get("matchInfo") or {}).get("gameStartMillis", 0) // 1000,
+        'kills': (player.get("stats") or {}).get("kills", 0),
+        'deaths': (player.get("stats") or {}).get("deaths", 0),
+        'headshots': 0,
+        'bodyshots': 0,
+        'legshots': 0,
+    }
+    for round_result in data.get("roundResults") or []:
+        for player_stats in round_result.get("playerStats") or []:
+            if player_stats.get("subject") != puuid:
+                continue
+            for hit in player_stats.get("damage") or []:
+                row['headshots'] += hit.get("headshots", 0)
+                row['bodyshots'] += hit.get("bodyshots", 0)
+                row['legshots'] += hit.get("legshots", 0)
+    return row
+
+
+def match_rows(puuid, size, known_ids=()):
+    """Stat rows for matches not in known_ids, newest first, or None on failure."""
+    match_ids = recent_match_ids(puuid, min(size, HISTORY_DEPTH), known_ids)
+    if match_ids is None:
+        return None
+    rows = []
+    for match_id in match_ids:
+        row = match_row(puuid, match_id)
+        if row:
+            rows.append(row)
+    return rows
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from . import metrics
+from .events import IDLE, PREGAME, INGAME, RANGE
+
+# seconds between refresh cycles per game state
+INTERVALS = {
+    PREGAME: 2,      # agent locks change by the second
+    INGAME: 10,
+    RANGE: 30,
+    IDLE: 15,
+    None: 10,        # state not known yet
+}
+# idle polling backs off up to this interval while nothing happens
+IDLE_MAX_INTERVAL = 60
+IDLE_BACKOFF = 2
+
+
+class RefreshScheduler:
+    """Runs a refresh cycle on its own thread at a cadence set by the game state.
+
+    cycle() does one refresh and returns the observed state (IDLE, PREGAME,
+    INGAME, RANGE or None). At most one cycle is ever in flight: trigger()
+    during a running cycle only schedules another one right after it.
+    """
+
+    def __init__(self, cycle, intervals=None):
+        self.cycle = cycle
+        self.intervals = dict(INTERVALS, **(intervals or {}))
+        self.state = None
+        self.interval = self.intervals[None]
+        self.in_flight = False
+        self.cycles = 0
+        self.last_cycle_time = None
+        self._idle_streak = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Run a cycle now (or right after the one in flight)."""
+        self._wake.set()
+
+    def set_state(self, state):
+        """Adopt a state reported from outside (e.g. the event feed) and refresh."""
+        self._update_state(state)
+        self.trigger()
+
+    def run_once(self):
+        """Run one cycle unless one is already in flight; returns False if skipped."""
+        if not self._run_lock.acquire(blocking=False):
+            return False
+        self.in_flight = True
+        start = time.perf_counter()
+        try:
+            state = self.cycle()
+        except Exception as e:
+            print(f"[!] Refresh cycle failed: {e}")
+            state = self.state
+        finally:
+            self.in_flight = False
+            self.cycles += 1
+            self.last_cycle_time = time.perf_counter() - start
+            self._run_lock.release()
+        metrics.REFRESH_CYCLES.observe(self.last_cycle_time, state=state or "unknown")
+        self._update_state(state)
+        return True
+
+    def _update_state(self, state):
+        if state == IDLE and self.state == IDLE:
+            self._idle_streak += 1
+        else:
+            self._idle_streak = 0
+        self.state = state
+        interval = self.intervals.get(state, self.intervals[None])
+        if state == IDLE:
+            interval = min(interval * IDLE_BACKOFF ** self._idle_streak, IDLE_MAX_INTERVAL)
+        self.interval = interval
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            self.run_once()
+            # the interval counts from the end of a cycle, so slow cycles never overlap
+            self._wake.wait(self.interval)
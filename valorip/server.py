@@ -0,0 +1,216 @@
+import dataclasses
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import metrics, stats, ws
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7878
+
+
+def snapshot_dict(snapshot):
+    return dataclasses.asdict(snapshot) if snapshot else None
+
+
+class _Subscriber:
+    """One websocket consumer; only the newest unsent payload is kept, so a
+    slow reader skips versions instead of holding up everyone else."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.pending = None
+        self.wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def push(self, text):
+        with self._lock:
+            self.pending = text
+        self.wake.set()
+
+    def take(self):
+        with self._lock:
+            text, self.pending = self.pending, None
+        return text
+
+
+class SnapshotServer:
+    """Serves a MatchPipeline's latest state as JSON and pushes changes over a websocket.
+
+    Endpoints: /api/state (everything), /api/snapshot, /api/loadouts[/<puuid>],
+    /api/stats[/<puuid>], /api/metrics (JSON), /metrics (Prometheus) and /ws.
+    Consumers only read what the pipeline has already fetched; stats come
+    from the on-disk cache and are never fetched on a consumer's behalf, but
+    the state is republished whenever stats for a player in it are stored.
+    """
+
+    def __init__(self, pipeline, host=SERVER_HOST, port=SERVER_PORT):
+        self.pipeline = pipeline
+        self.version = 0
+        self.payload = self._build(pipeline.snapshot, pipeline.state, pipeline.error)
+        self._text = json.dumps(self.payload)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # held from build to swap, so an older build never replaces a newer one
+        self._publish_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.snapshot_server = self
+        pipeline.subscribe(self.on_update)
+        stats.subscribe(self.on_stats_change)
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def _build(self, snapshot, state, error):
+        players = snapshot.players if snapshot else []
+        return {
+            'version': self.version,
+            'state': state,
+            'error': str(error) if error else None,
+            'snapshot': snapshot_dict(snapshot),
+            'stats': {p.puuid: stats.cached_stats(p.puuid) for p in players},
+        }
+
+    def on_update(self, snapshot, state, error):
+        """Pipeline subscriber: republish only when something actually changed."""
+        with self._publish_lock:
+            self._publish(self._build(snapshot, state, error))
+
+    def on_stats_change(self, puuid):
+        """Stats subscriber: rebuild the state when a listed player's stats are stored."""
+        # prefetches finish after the match was published, and a settled match
+        # publishes nothing more until it ends
+        with self._publish_lock:
+            snapshot = self.pipeline.snapshot
+            if snapshot and snapshot.get_player(puuid):
+                self._publish(self._build(snapshot, self.pipeline.state, self.pipeline.error))
+
+    def _publish(self, payload):
+        with self._lock:
+            payload['version'] = self.version
+            if payload == self.payload:
+                return
+            self.version += 1
+            payload['version'] = self.version
+            self.payload = payload
+            self._text = json.dumps(payload)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(self._text)
+
+    def current(self):
+        with self._lock:
+            return self.payload, self._text
+
+    def add(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+            subscriber.push(self._text)
+
+    def remove(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.pipeline.unsubscribe(self.on_update)
+        stats.unsubscribe(self.on_stats_change)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "Valoripper"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.snapshot_server
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/ws":
+            return self._websocket(server)
+        if path == "/metrics":
+            return self._send(metrics.to_prometheus(), "text/plain; version=0.0.4")
+        if path == "/api/metrics":
+            return self._send_json(metrics.to_json())
+
+        payload, text = server.current()
+        snapshot = payload['snapshot'] or {}
+        parts = path.split("/")[1:]
+        if path in ("", "/api/state"):
+            return self._send_json(text)
+        if path == "/api/snapshot":
+            return self._send_json(json.dumps(payload['snapshot']))
+        if parts[:2] == ["api", "loadouts"] and len(parts) <= 3:
+            loadouts = snapshot.get('loadouts') or {}
+            if len(parts) == 2:
+                return self._send_json(json.dumps(loadouts))
+            if parts[2] in loadouts:
+                return self._send_json(json.dumps(loadouts[parts[2]]))
+        if parts[:2] == ["api", "stats"] and len(parts) <= 3:
+            if len(parts) == 2:
+                return self._send_json(json.dumps(payload['stats']))
+            return self._send_json(json.dumps(stats.cached_stats(parts[2])))
+        self._send_json(json.dumps({'error': 'not found'}), 404)
+
+    def _send_json(self, text, status=200):
+        self._send(text, "application/json", status)
+
+    def _send(self, text, content_type, status=200):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _websocket(self, server):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            return self._send_json(json.dumps({'error': 'websocket upgrade required'}), 400)
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", ws.accept_key(key))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        websocket = ws.WebSocket(self.connection, is_client=False)
+        subscriber = _Subscriber(websocket)
+
+        def read():
+            # answers pings and notices the close; consumers have nothing to say
+            while websocket.recv() is not None:
+                pass
+            subscriber.wake.set()
+
+        threading.Thread(target=read, daemon=True).start()
+        server.add(subscriber)
+        try:
+            while not websocket.closed:
+                subscriber.wake.wait()
+                subscriber.wake.clear()
+                text = subscriber.take()
+                if text and not websocket.closed:
+                    websocket.send_text(text)
+        except OSError:
+            pass
+        finally:
+            server.remove(subscriber)
+            websocket.close()
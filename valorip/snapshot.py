@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+
+from . import constants, valapi
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE skins (uuid TEXT PRIMARY KEY, name TEXT, image_url TEXT);
+CREATE TABLE cards (uuid TEXT PRIMARY KEY, image_url TEXT);
+CREATE TABLE sprays (uuid TEXT PRIMARY KEY, name TEXT, image_url TEXT);
+CREATE TABLE agents (uuid TEXT PRIMARY KEY, icon_url TEXT);
+CREATE TABLE weapons (uuid TEXT PRIMARY KEY, category TEXT);
+"""
+
+
+def snapshot_path():
+    """Compiled, field-trimmed copy of the cached valorant-api JSON."""
+    return constants.APP_DATA_DIR / "content.db"
+
+
+def source_fingerprint():
+    """mtime/size of every cached JSON dataset, used to spot a stale snapshot."""
+    fingerprint = {}
+    for name in valapi.DATASETS:
+        path = valapi._cache_path(name)
+        if path.exists():
+            st = path.stat()
+            fingerprint[name] = [st.st_mtime_ns, st.st_size]
+    return fingerprint
+
+
+def write(catalog, path=None):
+    """Compile a catalog into the snapshot file, replacing it atomically."""
+    path = path or snapshot_path()
+    tmp_path = path.with_suffix(".db.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    # keep the catalog's insertion order; the prefix resolver depends on it
+    skins = [(uuid, name, catalog.skin_images.get(uuid)) for uuid, name in catalog.skin_names.items()]
+    skins += [(uuid, None, url) for uuid, url in catalog.skin_images.items()
+              if uuid not in catalog.skin_names]
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("schema", str(SCHEMA_VERSION)),
+            ("source", json.dumps(source_fingerprint(), sort_keys=True)),
+        ])
+        conn.executemany("INSERT INTO skins VALUES (?, ?, ?)", skins)
+        conn.executemany("INSERT INTO cards VALUES (?, ?)", catalog.card_images.items())
+        conn.executemany("INSERT INTO sprays VALUES (?, ?, ?)",
+                         [(uuid, name, url) for uuid, (name, url) in catalog.sprays.items()])
+        conn.executemany("INSERT INTO agents VALUES (?, ?)", catalog.agent_icons.items())
+        conn.executemany("INSERT INTO weapons VALUES (?, ?)", catalog.weapon_categories.items())
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    print(f"[+] Compiled content snapshot to {path}")
+
+
+def load(path=None):
+    """Build a catalog from the snapshot, or None if it is missing or stale."""
+    from .content import ContentCatalog
+
+    path = path or snapshot_path()
+    if not path.exists():
+        return None
+    try:
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"[!] Error opening content snapshot: {e}")
+        return None
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if meta.get("schema") != str(SCHEMA_VERSION):
+            return None
+        if json.loads(meta.get("source", "{}")) != source_fingerprint():
+            return None
+
+        catalog = ContentCatalog()
+        for uuid, name, image_url in conn.execute("SELECT uuid, name, image_url FROM skins ORDER BY rowid"):
+            if name:
+                catalog.skin_names[uuid] = name
+            catalog.skin_images[uuid] = image_url
+        catalog.card_images = dict(conn.execute("SELECT uuid, image_url FROM cards"))
+        catalog.sprays = {
+            uuid: (name, url)
+            for uuid, name, url in conn.execute("SELECT uuid, name, image_url FROM sprays")
+        }
+        catalog.agent_icons = dict(conn.execute("SELECT uuid, icon_url FROM agents"))
+        catalog.weapon_categories = dict(conn.execute("SELECT uuid, category FROM weapons"))
+        return catalog
+    except sqlite3.Error as e:
+        print(f"[!] Error reading content snapshot: {e}")
+        return None
+    finally:
+        conn.close()
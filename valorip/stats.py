@@ -0,0 +1,419 @@
+import json
+import sqlite3
+import threading
+import time
+
+from . import constants, identity, live_match, metrics, riot_stats
+from .ratelimit import RateLimitedError
+
+# seconds each field stays fresh; rank moves every game, career numbers barely
+FIELD_TTLS = {
+    'rank': 10 * 60,
+    'win_rate': 60 * 60,
+    'peak_rank': 24 * 60 * 60,
+    'kd': 6 * 60 * 60,
+    'hs_rate': 6 * 60 * 60,
+}
+
+# fields that come back from the same upstream call
+SOURCES = {
+    'mmr': ('rank', 'peak_rank', 'win_rate'),
+    'history': ('kd', 'hs_rate'),
+}
+
+# match history: how deep the K/D and HS% window goes, and how many matches
+# an incremental update asks for before assuming it missed some
+HISTORY_DEPTH = 100
+INCREMENTAL_SIZE = 10
+ROW_FIELDS = ('kills', 'deaths', 'headshots', 'bodyshots', 'legshots')
+
+# prefetch concurrency; the token bucket decides the actual request rate
+PREFETCH_WORKERS = 3
+# how long a popup waits for a prefetch of the same player already in flight
+PREFETCH_WAIT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_stats (
+    puuid TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (puuid, field)
+);
+CREATE TABLE IF NOT EXISTS match_rows (
+    puuid TEXT NOT NULL,
+    match_id TEXT NOT NULL,
+    started_at INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    headshots INTEGER NOT NULL,
+    bodyshots INTEGER NOT NULL,
+    legshots INTEGER NOT NULL,
+    PRIMARY KEY (puuid, match_id)
+);
+CREATE INDEX IF NOT EXISTS match_rows_recent ON match_rows (puuid, started_at DESC);
+CREATE TABLE IF NOT EXISTS player_totals (
+    puuid TEXT PRIMARY KEY,
+    matches INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    headshots INTEGER NOT NULL,
+    bodyshots INTEGER NOT NULL,
+    legshots INTEGER NOT NULL
+);
+"""
+
+
+class StatsStore:
+    """On-disk per-PUUID stats with a TTL per field."""
+
+    def __init__(self, path=None):
+        self.path = path or constants.APP_DATA_DIR / "stats.db"
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, puuid):
+        """Return ({field: value}, {stale source names}) for a player."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, value, fetched_at FROM player_stats WHERE puuid = ?", (puuid,)
+            ).fetchall()
+        values, fresh = {}, set()
+        for field, value, fetched_at in rows:
+            values[field] = json.loads(value)
+            if now - fetched_at < FIELD_TTLS.get(field, 0):
+                fresh.add(field)
+        stale = {source for source, fields in SOURCES.items() if not fresh.issuperset(fields)}
+        return values, stale
+
+    def put(self, puuid, values):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO player_stats VALUES (?, ?, ?, ?)",
+                [(puuid, field, json.dumps(value), now) for field, value in values.items()],
+            )
+            self._conn.commit()
+
+    def recent_match_ids(self, puuid, limit=HISTORY_DEPTH):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT match_id FROM match_rows WHERE puuid = ? ORDER BY started_at DESC LIMIT ?",
+                (puuid, limit),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_match_rows(self, puuid, rows, keep=HISTORY_DEPTH):
+        """Store new per-match rows and fold them into the running totals.
+
+        Only the newest `keep` rows are kept, and the totals always cover
+        exactly those, so the full-window stats never need a re-sum.
+        """
+        added = 0
+        with self._lock:
+            for row in rows:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO match_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (puuid, row['match_id'], row['started_at'], *(row[f] for f in ROW_FIELDS)),
+                )
+                if cur.rowcount:
+                    added += 1
+                    self._conn.execute(
+                        "INSERT INTO player_totals VALUES (?, 1, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(puuid) DO UPDATE SET matches = matches + 1, "
+                        + ", ".join(f"{f} = {f} + excluded.{f}" for f in ROW_FIELDS),
+                        (puuid, *(row[f] for f in ROW_FIELDS)),
+                    )
+            if added:
+                self._prune(puuid, keep)
+            self._conn.commit()
+        return added
+
+    def _prune(self, puuid, keep):
+        """Drop rows past the newest `keep` and take them out of the totals. Lock held."""
+        old = self._conn.execute(
+            "SELECT match_id, " + ", ".join(ROW_FIELDS) + " FROM match_rows WHERE puuid = ? "
+            "ORDER BY started_at DESC, match_id LIMIT -1 OFFSET ?",
+            (puuid, keep),
+        ).fetchall()
+        if not old:
+            return
+        self._conn.executemany(
+            "DELETE FROM match_rows WHERE puuid = ? AND match_id = ?", [(puuid, row[0]) for row in old]
+        )
+        removed = [sum(row[i + 1] for row in old) for i in range(len(ROW_FIELDS))]
+        self._conn.execute(
+            "UPDATE player_totals SET matches = matches - ?, "
+            + ", ".join(f"{f} = {f} - ?" for f in ROW_FIELDS) + " WHERE puuid = ?",
+            (len(old), *removed, puuid),
+        )
+
+    def rolling(self, puuid, window):
+        """Stat rows for the player's last `window` stored matches, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT " + ", ".join(ROW_FIELDS) + " FROM match_rows WHERE puuid = ? "
+                "ORDER BY started_at DESC, match_id LIMIT ?",
+                (puuid, window),
+            ).fetchall()
+        return [dict(zip(ROW_FIELDS, row)) for row in rows]
+
+    def totals(self, puuid):
+        """Running totals over the stored (newest HISTORY_DEPTH) matches, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT matches, " + ", ".join(ROW_FIELDS) + " FROM player_totals WHERE puuid = ?",
+                (puuid,),
+            ).fetchone()
+        if row:
+            return dict(zip(('matches',) + ROW_FIELDS, row))
+        return None
+
+
+_store = None
+_store_lock = threading.Lock()
+_inflight = {}
+# on_change(puuid) callbacks, run on whichever thread stored new stats
+_subscribers = []
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StatsStore()
+        return _store
+
+
+class HenrikBackend:
+    """Stats from Henrik's API; needs the player's Riot ID."""
+
+    limiter = live_match.henrik_limiter
+
+    def mmr(self, puuid, username, tag):
+        return live_match.henrik_mmr_stats(username, tag)
+
+    def match_rows(self, puuid, username, tag, size, known_ids):
+        return live_match.henrik_match_rows(username, tag, puuid, size=size, known_ids=known_ids)
+
+
+class RiotBackend:
+    """Stats from Riot's pd MMR and match endpoints, by PUUID alone."""
+
+    limiter = riot_stats.pd_limiter
+
+    def mmr(self, puuid, username, tag):
+        return riot_stats.mmr_stats(puuid)
+
+    def match_rows(self, puuid, username, tag, size, known_ids):
+        return riot_stats.match_rows(puuid, size, known_ids)
+
+
+BACKENDS = {
+    'henrik': HenrikBackend(),
+    'riot': RiotBackend(),
+}
+
+
+def subscribe(on_change):
+    with _store_lock:
+        _subscribers.append(on_change)
+    return on_change
+
+
+def unsubscribe(on_change):
+    with _store_lock:
+        if on_change in _subscribers:
+            _subscribers.remove(on_change)
+
+
+def _notify(puuid):
+    with _store_lock:
+        subscribers = list(_subscribers)
+    for on_change in subscribers:
+        try:
+            on_change(puuid)
+        except Exception as e:
+            print(f"[!] Stats subscriber failed: {e}")
+
+
+def get_backend():
+    """The stats backend picked by constants.STATS_BACKEND."""
+    backend = BACKENDS.get(constants.STATS_BACKEND)
+    if backend is None:
+        print(f"[!] Unknown stats backend {constants.STATS_BACKEND!r}, using henrik")
+        backend = BACKENDS['henrik']
+    return backend
+
+
+def sync_history(puuid, username, tag):
+    """Pull only matches newer than the ones already stored; False on failure."""
+    backend = get_backend()
+    store = get_store()
+    known = store.recent_match_ids(puuid)
+    size = INCREMENTAL_SIZE if known else HISTORY_DEPTH
+    rows = backend.match_rows(puuid, username, tag, size, known)
+    if rows is None:
+        return False
+    if known and len(rows) >= size:
+        # every recent match was new, so there may be a gap: backfill
+        rows = backend.match_rows(puuid, username, tag, HISTORY_DEPTH, known)
+        if rows is None:
+            return False
+    added = store.add_match_rows(puuid, rows)
+    print(f"[*] History for {puuid[:8]}: {added} new matches")
+    return True
+
+
+def get_rolling_stats(puuid, window=HISTORY_DEPTH):
+    """K/D and HS% over the player's last `window` stored matches."""
+    store = get_store()
+    if window >= HISTORY_DEPTH:
+        # the running totals cover exactly the stored window
+        totals = store.totals(puuid)
+        return live_match.aggregate_rows([totals] if totals else [])
+    return live_match.aggregate_rows(store.rolling(puuid, window))
+
+
+def fetch_source(source, puuid, username, tag):
+    """Fetch one source's fields from the configured backend."""
+    if source == 'mmr':
+        return get_backend().mmr(puuid, username, tag)
+    if source == 'history':
+        if not sync_history(puuid, username, tag):
+            return {}
+        return get_rolling_stats(puuid) or {'kd': None, 'hs_rate': None}
+    return {}
+
+
+def refresh(puuid, username, tag, sources=None):
+    """Fetch the given (default: all) sources now and store them."""
+    # the name-service cache knows the real Riot ID even when a snapshot fell back to Player_xxx
+    name = identity.get_cache().get(puuid)
+    if name and '#' in name:
+        username, tag = name, None
+    username, tag = live_match._split_riot_id(username, tag)
+    store = get_store()
+    changed = False
+    for source in sources or SOURCES:
+        values = fetch_source(source, puuid, username, tag)
+        if values:
+            # store every field of the source so a missing one is not refetched each time
+            store.put(puuid, {field: values.get(field) for field in SOURCES[source]})
+            changed = True
+    if changed:
+        _notify(puuid)
+    return _as_stats(store.get(puuid)[0])
+
+
+def cached_stats(puuid):
+    """Whatever is stored for a player, fresh or not, without fetching anything."""
+    return _as_stats(get_store().get(puuid)[0])
+
+
+def _as_stats(values):
+    stats = {field: values.get(field) for field in FIELD_TTLS}
+    if any(v is not None for v in stats.values()):
+        return stats
+    return None
+
+
+def _refresh_once(puuid, username, tag, sources=None):
+    """refresh(), but concurrent callers for the same player share one fetch."""
+    with _store_lock:
+        done = _inflight.get(puuid)
+        owner = done is None
+        if owner:
+            done = _inflight[puuid] = threading.Event()
+    if not owner:
+        done.wait(PREFETCH_WAIT)
+        return _as_stats(get_store().get(puuid)[0])
+    try:
+        return refresh(puuid, username, tag, sources)
+    finally:
+        with _store_lock:
+            _inflight.pop(puuid, None)
+        done.set()
+
+
+def get_stats(puuid, username, tag, on_update=None):
+    """Return stats for a player, serving cached values immediately.
+
+    Nothing cached: fetch synchronously (or wait for a prefetch already
+    running). Stale fields: return what is cached and refresh in the
+    background, then call on_update(stats).
+    """
+    values, stale = get_store().get(puuid)
+    metrics.cache_lookup("stats", bool(values) and not stale)
+    if not values:
+        try:
+            return _refresh_once(puuid, username, tag)
+        except RateLimitedError as e:
+            print(f"[!] Stats for {username} skipped: {e}")
+            return None
+
+    if stale:
+        def worker():
+            try:
+                stats = _refresh_once(puuid, username, tag, stale)
+            except RateLimitedError as e:
+                print(f"[!] Stats refresh for {username} skipped: {e}")
+                return
+            except Exception as e:
+                print(f"[!] Stats refresh for {username} failed: {e}")
+                return
+            if on_update and stats:
+                on_update(stats)
+
+        threading.Thread(target=worker, daemon=True).start()
+    return _as_stats(values)
+
+
+def prefetch_match(snapshot, puuids=None, workers=PREFETCH_WORKERS):
+    """Warm the stats cache for the players in a MatchSnapshot.
+
+    Only the players in `puuids` are queued when given. Enemies go first.
+    Work stops as soon as the backend's quota runs out, so popups opened
+    later still have quota to fetch on demand.
+    """
+    own = snapshot.get_player(constants.PUUID)
+    own_team = own.team_id if own else None
+    # enemies first, then teammates, then ourselves
+    players = sorted(
+        [p for p in snapshot.players if puuids is None or p.puuid in puuids],
+        key=lambda p: (p.team_id == own_team, p.puuid == constants.PUUID),
+    )
+    store = get_store()
+    queue = [p for p in players if store.get(p.puuid)[1]]
+    if not queue:
+        return None
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                player = queue.pop(0)
+            if get_backend().limiter.blocked:
+                print("[!] Stats prefetch stopped: rate limited")
+                return
+            parts = player.ign.username.split('#')
+            try:
+                _, stale = store.get(player.puuid)
+                _refresh_once(player.puuid, parts[0], parts[1] if len(parts) > 1 else 'NA1', stale)
+            except RateLimitedError as e:
+                print(f"[!] Stats prefetch stopped: {e}")
+                with lock:
+                    queue.clear()
+                return
+            except Exception as e:
+                print(f"[!] Stats prefetch for {player.ign.username} failed: {e}")
+
+    print(f"[*] Prefetching stats for {len(queue)} players")
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(workers, len(queue)))]
+    for thread in threads:
+        thread.start()
+    return threads
@@ -1,25 +1,92 @@
 import json
+import os
+import shutil
+import threading
 from pathlib import Path
-import requests
 
 from . import constants
+from .client import riot
 
-_session = requests.Session()
+# overridable so the refresh path can be pointed at a local stand-in server
+API_BASE = "https://valorant-api.com/v1"
+
+# cache name -> valorant-api endpoint for every static dataset Valoripper reads
+DATASETS = {
+    'weapon_skins': 'weapons/skins',
+    'playercards': 'playercards',
+    'sprays': 'sprays',
+    'agents': 'agents',
+    'weapons': 'weapons',
+}
+
+_refresh_lock = threading.Lock()
+_manifest_lock = threading.Lock()
 
 def _cache_path(name: str) -> Path:
     return constants.APP_DATA_DIR / f"{name}.json"
 
-def fetch_and_cache(name: str, endpoint: str) -> dict:
+def _manifest_path() -> Path:
+    return constants.APP_DATA_DIR / "manifest.json"
+
+def copy_static_data(source_dir: Path):
+    """Copy the cached datasets and their manifest over from another data dir."""
+    for path in [*(_cache_path(name) for name in DATASETS), _manifest_path()]:
+        source = source_dir / path.name
+        if source.exists():
+            shutil.copyfile(source, path)
+
+def _write_atomic(path: Path, text: str):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def load_manifest() -> dict:
+    """Content version and HTTP validators recorded for the cached datasets."""
+    path = _manifest_path()
+    if path.exists():
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[!] Error reading cache manifest: {e}")
+    return {"version": None, "datasets": {}}
+
+def _save_manifest(manifest: dict):
+    _write_atomic(_manifest_path(), json.dumps(manifest, indent=2))
+
+def fetch_and_cache(name: str, endpoint: str, conditional: bool = False) -> dict | None:
     """
     Fetch data from Valorant API and cache it locally.
+
+    With conditional=True the stored ETag/Last-Modified are sent and None is
+    returned when the server answers 304 Not Modified.
     """
-    url = f"https://valorant-api.com/v1/{endpoint}"
+    url = f"{API_BASE}/{endpoint}"
+    manifest = load_manifest()
+    validators = manifest.get("datasets", {}).get(name, {})
+    headers = {}
+    if conditional and _cache_path(name).exists():
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
     print(f"[*] Fetching from {url}")
-    resp = _session.get(url, timeout=15)
+    resp = riot.get(url, headers=headers)
+    if resp.status_code == 304:
+        print(f"[+] {name} unchanged")
+        return None
     resp.raise_for_status()
     data = resp.json()
     path = _cache_path(name)
-    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    _write_atomic(path, json.dumps(data))
+
+    with _manifest_lock:
+        manifest = load_manifest()
+        manifest.setdefault("datasets", {})[name] = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }
+        _save_manifest(manifest)
     print(f"[+] Cached {name} data to {path}")
     return data
 
@@ -33,25 +100,82 @@ def load_cached(name: str) -> dict | None:
             return None
     return None
 
+def fetch_version() -> dict:
+    """Get the current game content version from valorant-api."""
+    resp = riot.get(f"{API_BASE}/version")
+    resp.raise_for_status()
+    return resp.json().get("data", {})
+
+def apply_client_version(version_info: dict):
+    """Use the live client version for X-Riot-ClientVersion if we know it."""
+    client_version = version_info.get("riotClientVersion")
+    if client_version:
+        constants.VERSION = client_version
+
 def ensure_static_data():
     """
-    Ensure weapon skins, player cards, and sprays data are available.
+    Ensure weapon skins, player cards, sprays, agents and weapons data are available.
     """
+    apply_client_version({"riotClientVersion": load_manifest().get("client_version")})
     try:
-        # Check and fetch weapon skins
-        if not load_cached('weapon_skins'):
-            print("[*] No cached skin data found, fetching...")
-            fetch_and_cache('weapon_skins', 'weapons/skins')
-        
-        # Check and fetch player cards
-        if not load_cached('playercards'):
-            print("[*] No cached player card data found, fetching...")
-            fetch_and_cache('playercards', 'playercards')
-        
-        # Check and fetch sprays
-        if not load_cached('sprays'):
-            print("[*] No cached spray data found, fetching...")
-            fetch_and_cache('sprays', 'sprays')
-            
+        for name, endpoint in DATASETS.items():
+            # a cache file that no longer parses is as good as a missing one
+            if load_cached(name) is None:
+                print(f"[*] No usable cached {name} data found, fetching...")
+                fetch_and_cache(name, endpoint)
+
     except Exception as e:
-        print(f"[!] Failed to ensure static data: {e}")
\ No newline at end of file
+        print(f"[!] Failed to ensure static data: {e}")
+
+def refresh_static_data() -> list[str]:
+    """
+    Bring the cached datasets up to date with the current content version.
+
+    Costs one version request when nothing changed; otherwise each dataset is
+    revalidated and only the ones the server reports as modified are
+    downloaded. Returns the names of the datasets that were rewritten.
+    """
+    with _refresh_lock:
+        version_info = fetch_version()
+        apply_client_version(version_info)
+        version = version_info.get("manifestId") or version_info.get("version")
+
+        manifest = load_manifest()
+        missing = [name for name in DATASETS if not _cache_path(name).exists()]
+        if version and version == manifest.get("version") and not missing:
+            print(f"[+] Static data is current ({version_info.get('version', version)})")
+            return []
+
+        changed = []
+        failed = False
+        for name, endpoint in DATASETS.items():
+            try:
+                if fetch_and_cache(name, endpoint, conditional=True) is not None:
+                    changed.append(name)
+            except Exception as e:
+                print(f"[!] Failed to refresh {name}: {e}")
+                failed = True
+
+        # only pin the version once every dataset is known to match it
+        with _manifest_lock:
+            manifest = load_manifest()
+            manifest["client_version"] = version_info.get("riotClientVersion")
+            if not failed:
+                manifest["version"] = version
+            _save_manifest(manifest)
+        return changed
+
+def refresh_in_background(on_change=None) -> threading.Thread:
+    """Run refresh_static_data on a daemon thread, calling on_change(names) if anything changed."""
+    def worker():
+        try:
+            changed = refresh_static_data()
+        except Exception as e:
+            print(f"[!] Static data refresh failed: {e}")
+            return
+        if changed and on_change:
+            on_change(changed)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
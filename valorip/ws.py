@@ -0,0 +1,193 @@
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import threading
+
+# Minimal RFC 6455 framing used for the Riot Client event feed and the local
+# snapshot server. Text/close/ping/pong only; no extensions or fragments out.
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+def accept_key(key):
+    digest = hashlib.sha1((key + GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def _recv_exact(sock, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise WebSocketClosed("connection closed")
+        buf += chunk
+    return buf
+
+
+def read_frame(sock):
+    """Read one frame; returns (fin, opcode, payload)."""
+    b1, b2 = _recv_exact(sock, 2)
+    fin = bool(b1 & 0x80)
+    opcode = b1 & 0x0F
+    masked = bool(b2 & 0x80)
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if masked else None
+    payload = _recv_exact(sock, length) if length else b""
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return fin, opcode, payload
+
+
+def write_frame(sock, opcode, payload=b"", mask=False):
+    """Write one unfragmented frame (clients must mask, servers must not)."""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack(">H", length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack(">Q", length)
+    if mask:
+        key = os.urandom(4)
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+        header += key
+    sock.sendall(header + payload)
+
+
+class WebSocket:
+    """A connected websocket (either end)."""
+
+    def __init__(self, sock, is_client):
+        self.sock = sock
+        self.is_client = is_client
+        self.closed = False
+        # the reader answers pings while other threads send; frames must not interleave
+        self._write_lock = threading.Lock()
+
+    def write_frame(self, opcode, payload=b""):
+        """Send one frame, masked if we are the client."""
+        with self._write_lock:
+            write_frame(self.sock, opcode, payload, mask=self.is_client)
+
+    def send_text(self, text):
+        self.write_frame(OP_TEXT, text.encode("utf-8"))
+
+    def recv(self):
+        """Next text/binary message as str, or None once the peer closed."""
+        parts = []
+        while True:
+            try:
+                fin, opcode, payload = read_frame(self.sock)
+            except (WebSocketClosed, OSError):
+                self.closed = True
+                return None
+            if opcode == OP_PING:
+                try:
+                    self.write_frame(OP_PONG, payload)
+                except OSError:
+                    self.closed = True
+                    return None
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                self.close()
+                return None
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8", errors="replace")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.write_frame(OP_CLOSE)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def connect(host, port, path="/", headers=None, use_ssl=True, timeout=10):
+    """Open a client websocket. Certificates are not verified (local client)."""
+    sock = socket.create_connection((host, port), timeout=timeout)
+    if use_ssl:
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        sock = ctx.wrap_socket(sock, server_hostname=host)
+
+    key = base64.b64encode(os.urandom(16)).decode()
+    lines = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {host}:{port}",
+        "Upgrade: websocket",
+        "Connection: Upgrade",
+        f"Sec-WebSocket-Key: {key}",
+        "Sec-WebSocket-Version: 13",
+    ]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+    response = b""
+    while b"\r\n\r\n" not in response:
+        chunk = sock.recv(1024)
+        if not chunk:
+            raise WebSocketClosed("handshake failed")
+        response += chunk
+    head, _, rest = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    if status_line.split()[1:2] != ["101"]:
+        sock.close()
+        raise WebSocketClosed(f"handshake rejected: {status_line}")
+    response_headers = {
+        k.strip().lower(): v.strip()
+        for k, _, v in (line.partition(":") for line in header_lines)
+    }
+    if response_headers.get("sec-websocket-accept") != accept_key(key):
+        sock.close()
+        raise WebSocketClosed("bad Sec-WebSocket-Accept")
+    if rest:
+        # frames that arrived with the handshake; unusual, keep them readable
+        sock = _PrefixedSocket(sock, rest)
+    sock.settimeout(None)
+    return WebSocket(sock, is_client=True)
+
+
+class _PrefixedSocket:
+    def __init__(self, sock, prefix):
+        self._sock = sock
+        self._prefix = prefix
+
+    def recv(self, n):
+        if self._prefix:
+            data, self._prefix = self._prefix[:n], self._prefix[n:]
+            return data
+        return self._sock.recv(n)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)